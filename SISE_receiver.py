@@ -3,9 +3,9 @@
 ================================================================================
 SISE_receiver.py - KRX 시세 수신 및 Redis 배포
 ================================================================================
-역할: KRX UDP 멀티캐스트 수신 → ISIN 분류 → Redis publish
+역할: KRX UDP 멀티캐스트 수신 → ISIN 분류 → Redis Stream 발행 (XADD)
 
-Redis 채널 (6개로 세분화):
+Redis 스트림 (6개로 세분화, 필드 'p'에 메시지 저장, MAXLEN ~ STREAM_MAXLEN):
 - krx:futures:stock       (주식선물)
 - krx:futures:index       (지수선물)
 - krx:options:call:stock  (주식콜옵션)
@@ -15,6 +15,7 @@ Redis 채널 (6개로 세분화):
 
 메시지 포맷:
 - timestamp (8 bytes, double) + port (2 bytes, unsigned short) + raw packet
+  (little-endian)
 
 ISIN 분류 기준:
 - 주식선물: DB(futures_master)에 등록된 ISIN prefix
@@ -24,16 +25,22 @@ ISIN 분류 기준:
 ================================================================================
 """
 
+import ctypes
+import errno
+import os
+import selectors
 import socket
 import struct
+import sys
 import threading
 import time
 import json
+import queue
 import redis
 import psycopg2
 from datetime import datetime
 from pathlib import Path
-from typing import Set
+from typing import FrozenSet
 
 # ==============================================================================
 # 설정 (config.json에서 로드)
@@ -91,40 +98,97 @@ MULTICAST_CHANNELS = [
        'type': 'put'} for i in range(7)],
 ]
 
+# Redis 발행 채널(스트림 키): (멀티캐스트 채널 타입, 주식 여부) → 채널명
+CHANNELS = {
+    ('futures', False): b'krx:futures:index',
+    ('futures', True): b'krx:futures:stock',
+    ('call', False): b'krx:options:call:index',
+    ('call', True): b'krx:options:call:stock',
+    ('put', False): b'krx:options:put:index',
+    ('put', True): b'krx:options:put:stock',
+}
+
 # 관심 TR 코드 (호가 + 체결)
-TARGET_TR_CODES = [
+# 패킷마다 data[:5]로 조회하므로 list 대신 frozenset (해시 조회 O(1))
+TARGET_TR_CODES = frozenset([
     b'B604F', b'B605F',  # 호가
     b'A301F', b'A302F', b'A303F', b'A304F', b'A305F', b'A306F', b'A307F',
     b'A308F', b'A309F', b'A310F', b'A311F', b'A312F', b'A313F',
     b'A315F', b'A316F', b'A317F',  # 체결
-]
+])
 
 # ISIN 위치 (패킷 내)
 # TR코드: 0-5, ISIN: 17-29 (12자리) - filtered_saver.py와 동일
 ISIN_START = 17
 ISIN_END = 29
 ISIN_LENGTH = 12
+ISIN_PREFIX_END = ISIN_START + 6  # 주식/지수 판단용 앞 6자리
+
+# Redis 발행 배치 설정
+# 수신 스레드는 발행 큐(SimpleQueue)에 넣기만 하고, Redis writer 스레드가
+# 큐에 쌓인 메시지를 최대 REDIS_BATCH_SIZE개씩 모아 한 번에 전송
+REDIS_BATCH_SIZE = 256
+# 발행 큐 상한 (수신 배치 개수 기준, 배치당 최대 RECV_BATCH_SIZE개 메시지)
+# Redis 지연/장애 중 큐가 무한히 커지지 않도록 상한을 넘으면 수신 배치를 버리고 dropped로 집계
+PUBLISH_QUEUE_MAX_BATCHES = 4096
+# Redis 전송 실패 후 재접속 대기 (초, 실패할 때마다 2배, 최대 MAX)
+RECONNECT_BACKOFF_MIN = 0.5
+RECONNECT_BACKOFF_MAX = 5.0
+
+# 수신/발행 루프의 대기 timeout (초) - 종료 요청(running) 확인 주기
+LOOP_TIMEOUT = 0.1
+
+# Redis Stream 설정
+# Pub/Sub과 달리 log_saver가 멈춰도 메시지가 유실되지 않음 (재시작 시 이어서 읽음)
+# 스트림별 최대 길이 (MAXLEN ~, 근사 trim으로 메모리 상한 유지)
+STREAM_MAXLEN = 1_000_000
+STREAM_FIELD = b'p'
+
+# UDP 배치 수신 설정
+# 소켓이 readable일 때 한 번에 최대 RECV_BATCH_SIZE개 패킷을 읽음
+# (Linux: recvmmsg 시스템콜 1회, 그 외: 논블로킹 recv 반복)
+RECV_BATCH_SIZE = 64
+RECV_BUFFER_SIZE = 2048
+# 배치가 가득 찬 소켓은 select로 돌아가기 전에 최대 N번 연속으로 읽음
+RECV_DRAIN_ROUNDS = 16
+
+# 멀티캐스트 소켓 옵션
+# 커널 수신 버퍼를 키워 GC/Redis 지연 중 burst를 흡수 (Linux는 net.core.rmem_max로 제한됨)
+UDP_RCVBUF_SIZE = 8 * 1024 * 1024
+# Linux 전용 (지원하지 않거나 권한이 없으면 무시)
+SO_BUSY_POLL = 46        # socket.SO_BUSY_POLL 상수가 없어 직접 지정
+UDP_BUSY_POLL_US = 50    # busy poll 시간 (마이크로초)
+IP_MULTICAST_ALL = getattr(socket, 'IP_MULTICAST_ALL', 49)
+
+# 메시지 헤더 패킹 (timestamp: little-endian double)
+# port(2 bytes)는 소켓별 상수라 등록 시 한 번만 패킹, timestamp는 수신 배치당 한 번
+_PACK_D = struct.Struct('<d').pack
+_PACK_H = struct.Struct('<H').pack
 
 # 주식선물 ISIN prefix Set (DB에서 로드됨)
 # 시작 시 load_stock_futures_prefixes()로 채워짐
-STOCK_FUTURES_PREFIXES: Set[str] = set()
+# 패킷의 ISIN 슬라이스를 decode 없이 바로 조회하도록 bytes로 보관
+# 참고: 6바이트를 int.from_bytes로 48bit 정수화해서 조회하는 방식은 CPython에서
+#       from_bytes 호출 비용 때문에 bytes 슬라이스 조회보다 약 1.6배 느림 (측정)
+# 수신 루프가 참조하는 동안 바뀌지 않도록 로드 후에는 frozenset
+STOCK_FUTURES_PREFIXES: FrozenSet[bytes] = frozenset()
 
 # 주식옵션 ISIN prefix Set (DB에서 로드됨)
 # 시작 시 load_stock_options_prefixes()로 채워짐
-STOCK_OPTIONS_PREFIXES: Set[str] = set()
+STOCK_OPTIONS_PREFIXES: FrozenSet[bytes] = frozenset()
 
 
 # ==============================================================================
 # DB에서 주식선물 ISIN prefix 로드
 # ==============================================================================
 
-def load_stock_futures_prefixes() -> Set[str]:
+def load_stock_futures_prefixes() -> FrozenSet[bytes]:
     """
     DB(futures_master)에서 주식선물 ISIN prefix 목록 로드
 
     Returns:
         주식선물 ISIN prefix Set (앞 6자리)
-        예: {'KR4AB0', 'KR4A24', 'KR4ABN', ...}
+        예: {b'KR4AB0', b'KR4A24', b'KR4ABN', ...}
     """
     global STOCK_FUTURES_PREFIXES
 
@@ -134,7 +198,8 @@ def load_stock_futures_prefixes() -> Set[str]:
 
         # futures_master에서 모든 선물 코드의 앞 6자리 추출
         cur.execute("SELECT DISTINCT LEFT(future_code, 6) FROM futures_master")
-        prefixes = {row[0] for row in cur.fetchall() if row[0]}
+        prefixes = frozenset(row[0].encode('ascii', errors='ignore')
+                             for row in cur.fetchall() if row[0])
 
         cur.close()
         conn.close()
@@ -146,16 +211,16 @@ def load_stock_futures_prefixes() -> Set[str]:
     except Exception as e:
         print(f"[!] DB 연결 실패, 기본값 사용: {e}")
         # DB 연결 실패 시 빈 Set 반환 (모두 지수선물로 분류됨)
-        return set()
+        return frozenset()
 
 
-def load_stock_options_prefixes() -> Set[str]:
+def load_stock_options_prefixes() -> FrozenSet[bytes]:
     """
     DB(stock_options_master)에서 주식옵션 ISIN prefix 목록 로드
 
     Returns:
         주식옵션 ISIN prefix Set (앞 6자리)
-        예: {'KR4B11', 'KR4BBN', 'KR4C11', ...}
+        예: {b'KR4B11', b'KR4BBN', b'KR4C11', ...}
     """
     global STOCK_OPTIONS_PREFIXES
 
@@ -165,7 +230,8 @@ def load_stock_options_prefixes() -> Set[str]:
 
         # stock_options_master에서 모든 옵션 코드의 앞 6자리 추출
         cur.execute("SELECT DISTINCT LEFT(option_code, 6) FROM stock_options_master")
-        prefixes = {row[0] for row in cur.fetchall() if row[0]}
+        prefixes = frozenset(row[0].encode('ascii', errors='ignore')
+                             for row in cur.fetchall() if row[0])
 
         cur.close()
         conn.close()
@@ -177,64 +243,32 @@ def load_stock_options_prefixes() -> Set[str]:
     except Exception as e:
         print(f"[!] DB 연결 실패, 기본값 사용: {e}")
         # DB 연결 실패 시 빈 Set 반환 (모두 지수옵션으로 분류됨)
-        return set()
+        return frozenset()
 
 
 # ==============================================================================
 # ISIN 분류 함수
 # ==============================================================================
 
-def classify_futures_isin(isin_bytes: bytes) -> str:
-    """
-    선물 ISIN을 주식선물/지수선물로 분류
-
-    주식선물: DB(futures_master)에 등록된 ISIN prefix
-    지수선물: DB에 없는 선물 (코스피200, 코스닥150, 섹터지수, 금융상품선물 등)
-
-    Returns:
-        'krx:futures:stock' 또는 'krx:futures:index'
-    """
-    if len(isin_bytes) >= 6:
-        # ISIN 앞 6자리로 주식선물 여부 판단
-        try:
-            prefix = isin_bytes[:6].decode('ascii', errors='ignore')
-            if prefix in STOCK_FUTURES_PREFIXES:
-                return 'krx:futures:stock'
-        except:
-            pass
-
-    return 'krx:futures:index'
-
-
-def classify_options_isin(isin_bytes: bytes, option_type: str) -> str:
+def get_channel_dispatch(channel_type: str) -> tuple:
     """
-    옵션 ISIN을 주식옵션/지수옵션으로 분류
+    멀티캐스트 채널 타입별 ISIN 분류 테이블
 
-    주식옵션: DB(stock_options_master)에 등록된 ISIN prefix
-    지수옵션: DB에 없는 옵션 (코스피200옵션, 미니옵션 등)
+    주식선물/주식옵션: DB에 등록된 ISIN prefix
+    지수선물/지수옵션: DB에 없는 ISIN (코스피200, 코스닥150, 미니옵션 등)
 
-    Args:
-        isin_bytes: ISIN 바이트
-        option_type: 'call' 또는 'put'
+    make_receiver에서 isin_prefix in prefixes로 Redis 채널을 바로 결정
+    (DB prefix 로드 이후에 호출해야 함)
 
     Returns:
-        'krx:options:call:stock', 'krx:options:call:index',
-        'krx:options:put:stock', 또는 'krx:options:put:index'
+        (prefixes, (지수 채널, 주식 채널))
     """
-    is_stock_option = False
-
-    if len(isin_bytes) >= 6:
-        try:
-            prefix = isin_bytes[:6].decode('ascii', errors='ignore')
-            if prefix in STOCK_OPTIONS_PREFIXES:
-                is_stock_option = True
-        except:
-            pass
-
-    if option_type == 'call':
-        return 'krx:options:call:stock' if is_stock_option else 'krx:options:call:index'
-    else:  # put
-        return 'krx:options:put:stock' if is_stock_option else 'krx:options:put:index'
+    prefixes = {
+        'futures': STOCK_FUTURES_PREFIXES,
+        'call': STOCK_OPTIONS_PREFIXES,
+        'put': STOCK_OPTIONS_PREFIXES,
+    }[channel_type]
+    return prefixes, (CHANNELS[(channel_type, False)], CHANNELS[(channel_type, True)])
 
 
 # ==============================================================================
@@ -242,54 +276,137 @@ def classify_options_isin(isin_bytes: bytes, option_type: str) -> str:
 # ==============================================================================
 
 class Stats:
-    def __init__(self):
-        self.received = 0
-        self.published = 0
-        self.by_channel = {
-            'krx:futures:stock': 0,
-            'krx:futures:index': 0,
-            'krx:options:call:stock': 0,
-            'krx:options:call:index': 0,
-            'krx:options:put:stock': 0,
-            'krx:options:put:index': 0,
-        }
-        self.errors = 0
-        self.start_time = datetime.now()
-        self.lock = threading.Lock()
+    """
+    수신/발행 통계
 
-    def add(self, channel: str):
-        with self.lock:
-            self.published += 1
-            if channel in self.by_channel:
-                self.by_channel[channel] += 1
+    수신 스레드는 new_counter()로 받은 자기 카운터(dict)만 lock 없이 증가시키고
+    summary()에서 등록된 카운터를 합산 (상태 출력 스레드는 읽기만 함)
+    """
 
-    def add_received(self):
-        with self.lock:
-            self.received += 1
+    def __init__(self):
+        self.counters = []
+        self.start_time = datetime.now()
+        self.default = self.new_counter()  # 수신 루프 밖에서 발생한 에러 등
+
+    def new_counter(self) -> dict:
+        """스레드별 카운터 생성 및 등록"""
+        counter = {
+            'received': 0,
+            'published': 0,
+            'errors': 0,
+            'dropped': 0,  # 발행 큐 상한 초과/Redis 전송 실패로 버린 메시지
+            'by_channel': {channel: 0 for channel in CHANNELS.values()},
+        }
+        self.counters.append(counter)
+        return counter
 
     def add_error(self):
-        with self.lock:
-            self.errors += 1
+        self.default['errors'] += 1
 
     def summary(self) -> str:
-        with self.lock:
-            elapsed = (datetime.now() - self.start_time).total_seconds()
-            rate = self.published / elapsed if elapsed > 0 else 0
-            return (f"수신:{self.received:,} 발행:{self.published:,} "
-                    f"(주선:{self.by_channel['krx:futures:stock']:,} "
-                    f"지선:{self.by_channel['krx:futures:index']:,} "
-                    f"주콜:{self.by_channel['krx:options:call:stock']:,} "
-                    f"지콜:{self.by_channel['krx:options:call:index']:,} "
-                    f"주풋:{self.by_channel['krx:options:put:stock']:,} "
-                    f"지풋:{self.by_channel['krx:options:put:index']:,}) "
-                    f"에러:{self.errors} ({rate:.1f}/초)")
+        received = sum(c['received'] for c in self.counters)
+        published = sum(c['published'] for c in self.counters)
+        errors = sum(c['errors'] for c in self.counters)
+        dropped = sum(c['dropped'] for c in self.counters)
+        by_channel = {channel: sum(c['by_channel'][channel] for c in self.counters)
+                      for channel in CHANNELS.values()}
+
+        elapsed = (datetime.now() - self.start_time).total_seconds()
+        rate = published / elapsed if elapsed > 0 else 0
+        return (f"수신:{received:,} 발행:{published:,} "
+                f"(주선:{by_channel[b'krx:futures:stock']:,} "
+                f"지선:{by_channel[b'krx:futures:index']:,} "
+                f"주콜:{by_channel[b'krx:options:call:stock']:,} "
+                f"지콜:{by_channel[b'krx:options:call:index']:,} "
+                f"주풋:{by_channel[b'krx:options:put:stock']:,} "
+                f"지풋:{by_channel[b'krx:options:put:index']:,}) "
+                f"에러:{errors} 드롭:{dropped:,} ({rate:.1f}/초)")
 
 
 stats = Stats()
 
 
 # ==============================================================================
-# UDP 수신 → Redis Publish
+# Redis 발행 (RESP 직접 전송, 응답 없음)
+# ==============================================================================
+
+class RespPublisher:
+    """
+    Redis Stream XADD fire-and-forget 전송기
+
+    redis-py를 거치지 않고 RESP 프레임을 버퍼에 모았다가 sendall 한 번으로 전송
+    접속 직후 CLIENT REPLY OFF → Redis가 응답을 만들지 않으므로 recv 하지 않음
+    (XADD 응답인 entry ID는 사용하지 않음)
+    """
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.buffer = bytearray()
+        self.headers = {}  # channel -> RESP 헤더 (XADD channel MAXLEN ~ N * p)
+        self.backoff = RECONNECT_BACKOFF_MIN
+        self.retry_at = 0.0  # 이 시각(monotonic) 전에는 재접속하지 않음
+
+    def connect(self):
+        """Redis 접속 + CLIENT REPLY OFF"""
+        sock = socket.create_connection((self.host, self.port), timeout=5)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.sendall(b'*3\r\n$6\r\nCLIENT\r\n$5\r\nREPLY\r\n$3\r\nOFF\r\n')
+        self.sock = sock
+
+    def publish(self, channel: bytes, message: bytes):
+        """XADD 프레임을 버퍼에 추가 (전송은 flush에서)"""
+        header = self.headers.get(channel)
+        if header is None:
+            args = [b'XADD', channel, b'MAXLEN', b'~', b'%d' % STREAM_MAXLEN,
+                    b'*', STREAM_FIELD]
+            header = b'*%d\r\n' % (len(args) + 1) + b''.join(
+                b'$%d\r\n%s\r\n' % (len(arg), arg) for arg in args)
+            self.headers[channel] = header
+
+        buffer = self.buffer
+        buffer += header
+        buffer += b'$%d\r\n' % len(message)
+        buffer += message
+        buffer += b'\r\n'
+
+    def flush(self) -> bool:
+        """
+        버퍼 전송
+
+        Returns:
+            True if 전송 성공, False if 실패 (버퍼는 버리고 backoff 후 재접속)
+        """
+        if not self.buffer:
+            return True
+        try:
+            if self.sock is None:
+                if time.monotonic() < self.retry_at:
+                    return False  # 재접속 대기 중 (connect timeout에 매번 묶이지 않도록)
+                self.connect()
+            self.sock.sendall(self.buffer)
+            self.backoff = RECONNECT_BACKOFF_MIN
+            return True
+        except OSError:
+            self.close()
+            self.retry_at = time.monotonic() + self.backoff
+            self.backoff = min(self.backoff * 2, RECONNECT_BACKOFF_MAX)
+            return False
+        finally:
+            self.buffer.clear()
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+# ==============================================================================
+# UDP 멀티캐스트 소켓
 # ==============================================================================
 
 def create_multicast_socket(group: str, port: int) -> socket.socket:
@@ -300,6 +417,18 @@ def create_multicast_socket(group: str, port: int) -> socket.socket:
     """
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
     sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, UDP_RCVBUF_SIZE)
+
+    if sys.platform.startswith('linux'):
+        # 가입하지 않은 그룹(같은 포트의 다른 멀티캐스트) 패킷은 받지 않음
+        # busy poll로 softirq → 깨우기 지연 단축
+        for level, option, value in ((socket.IPPROTO_IP, IP_MULTICAST_ALL, 0),
+                                     (socket.SOL_SOCKET, SO_BUSY_POLL, UDP_BUSY_POLL_US)):
+            try:
+                sock.setsockopt(level, option, value)
+            except OSError:
+                pass
+
     sock.bind(('', port))
 
     # 멀티캐스트 그룹 가입 - 특정 NIC 지정
@@ -309,67 +438,304 @@ def create_multicast_socket(group: str, port: int) -> socket.socket:
     return sock
 
 
-def receive_and_publish(channel: dict, redis_client: redis.Redis, running: list):
+# ==============================================================================
+# UDP 배치 수신 (Linux recvmmsg)
+# ==============================================================================
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_IoVec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _MsgHdr),
+                ('msg_len', ctypes.c_uint)]
+
+
+def _load_recvmmsg():
+    """libc recvmmsg 로드 (Linux 외 플랫폼이거나 없으면 None)"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        fn = ctypes.CDLL(None, use_errno=True).recvmmsg
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint,
+                   ctypes.c_int, ctypes.c_void_p]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_recvmmsg = _load_recvmmsg()
+
+
+class MMsgReceiver:
+    """
+    recvmmsg 기반 배치 수신기 (소켓별 1개)
+
+    RECV_BATCH_SIZE개의 수신 버퍼와 mmsghdr 배열을 미리 할당해두고
+    시스템콜 1회로 여러 UDP 패킷을 읽음
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock  # fd 유지를 위해 참조 보관
+        self.fd = sock.fileno()
+        self.buffer = ctypes.create_string_buffer(RECV_BATCH_SIZE * RECV_BUFFER_SIZE)
+        self.base = ctypes.addressof(self.buffer)
+        self.iovecs = (_IoVec * RECV_BATCH_SIZE)()
+        self.msgs = (_MMsgHdr * RECV_BATCH_SIZE)()
+
+        for i in range(RECV_BATCH_SIZE):
+            self.iovecs[i].iov_base = self.base + i * RECV_BUFFER_SIZE
+            self.iovecs[i].iov_len = RECV_BUFFER_SIZE
+            self.msgs[i].msg_hdr.msg_iov = ctypes.pointer(self.iovecs[i])
+            self.msgs[i].msg_hdr.msg_iovlen = 1
+
+    def recv(self) -> list:
+        """수신 대기 중인 패킷을 최대 RECV_BATCH_SIZE개까지 읽어서 반환"""
+        n = _recvmmsg(self.fd, self.msgs, RECV_BATCH_SIZE, socket.MSG_DONTWAIT, None)
+        if n < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, os.strerror(err))
+
+        base = self.base
+        msgs = self.msgs
+        return [ctypes.string_at(base + i * RECV_BUFFER_SIZE, msgs[i].msg_len)
+                for i in range(n)]
+
+
+def create_batch_receiver(sock: socket.socket):
+    """
+    논블로킹 소켓용 배치 수신 함수 생성
+
+    Returns:
+        호출 시 패킷(bytes) 리스트를 반환하는 함수
+        Linux: recvmmsg, 그 외(Windows 등): 논블로킹 recv 반복
+    """
+    if _recvmmsg is not None:
+        return MMsgReceiver(sock).recv
+
+    recv = sock.recv
+
+    def recv_batch() -> list:
+        packets = []
+        for _ in range(RECV_BATCH_SIZE):
+            try:
+                packets.append(recv(RECV_BUFFER_SIZE))
+            except BlockingIOError:
+                break
+            except OSError:
+                stats.add_error()
+                break
+        return packets
+
+    return recv_batch
+
+
+# ==============================================================================
+# UDP 수신 / Redis 발행 루프
+# ==============================================================================
+
+def make_receiver(channel_type: str, port: int, recv_batch,
+                  publish_q: queue.SimpleQueue, counter: dict):
     """
-    UDP 수신 → Redis publish 루프
+    소켓 하나 전용 수신 함수 생성
+
+    채널 타입별 prefix 테이블, Redis 채널명, port 헤더, 배치 수신 함수는
+    소켓 수명 동안 고정이므로 클로저에 미리 묶어 둠
+    (수신 루프에서 채널 정보를 꺼내는 튜플 unpack/속성 조회가 없어짐)
+
+    Returns:
+        receive() - readable 이벤트마다 호출. 수신 가능한 패킷을 읽어서 분류 후 put
+        (발행 큐가 PUBLISH_QUEUE_MAX_BATCHES 이상이면 버리고 dropped 집계)
+    """
+    prefixes, (index_channel, stock_channel) = get_channel_dispatch(channel_type)
+    port_bytes = _PACK_H(port)
+    put = publish_q.put
+    qsize = publish_q.qsize
+    now = time.time
+    pack_d = _PACK_D
+    target_tr_codes = TARGET_TR_CODES
+
+    def receive():
+        # 배치가 가득 차면 커널 큐가 빌 때까지 select로 돌아가지 않고 계속 읽음
+        # (다른 소켓이 밀리지 않도록 최대 RECV_DRAIN_ROUNDS회)
+        for _ in range(RECV_DRAIN_ROUNDS):
+            try:
+                packets = recv_batch()
+            except Exception as e:
+                counter['errors'] += 1
+                return
+
+            counter['received'] += len(packets)
+
+            # 같은 배치로 읽은 패킷은 수신 시각이 같으므로 timestamp + port 헤더를 한 번만 생성
+            header = pack_d(now()) + port_bytes
+            batch = []
+            append = batch.append
+
+            for data in packets:
+                try:
+                    # TR 코드 필터링 (패킷 첫 5바이트)
+                    if data[:5] not in target_tr_codes:
+                        continue
+
+                    # Redis 채널 결정: ISIN 앞 6자리가 DB에 있으면 주식, 없으면 지수
+                    if (len(data) >= ISIN_END and
+                            data[ISIN_START:ISIN_PREFIX_END] in prefixes):
+                        redis_channel = stock_channel
+                    else:
+                        redis_channel = index_channel
+
+                    # 메시지: timestamp + port + raw packet
+                    append((redis_channel, header + data))
+
+                except Exception as e:
+                    counter['errors'] += 1
+
+            if batch:
+                if qsize() < PUBLISH_QUEUE_MAX_BATCHES:
+                    put(batch)
+                else:
+                    counter['dropped'] += len(batch)
+
+            if len(packets) < RECV_BATCH_SIZE:
+                return
+
+    return receive
+
+
+def open_multicast_sockets() -> list:
+    """
+    채널별 멀티캐스트 소켓 생성 → [(channel, sock), ...]
+
+    한 포트의 bind 충돌/IP_ADD_MEMBERSHIP 실패가 전체 수신을 막지 않도록
+    실패한 채널은 로그만 남기고 제외
+    실제 적용된 수신 버퍼(SO_RCVBUF)가 요청값보다 작은 소켓은 소켓별로 경고
+    """
+    sockets = []
+    rcvbufs = []
+    for ch in MULTICAST_CHANNELS:
+        try:
+            sock = create_multicast_socket(ch['group'], ch['port'])
+            sock.setblocking(False)
+            rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        except Exception as e:
+            print(f"[!] 소켓 생성 실패 ({ch['group']}:{ch['port']}), 채널 제외: {e}")
+            continue
+
+        # OS 제한(Linux: net.core.rmem_max)으로 요청값보다 작게 적용될 수 있음
+        if rcvbuf < UDP_RCVBUF_SIZE:
+            print(f"[!] UDP 수신 버퍼 부족 ({ch['group']}:{ch['port']}): "
+                  f"{rcvbuf:,} bytes (요청 {UDP_RCVBUF_SIZE:,})")
+        rcvbufs.append(rcvbuf)
+        sockets.append((ch, sock))
+
+    if rcvbufs:
+        print(f"[*] UDP 수신 버퍼: {min(rcvbufs):,} ~ {max(rcvbufs):,} bytes "
+              f"(요청 {UDP_RCVBUF_SIZE:,})")
+    return sockets
+
+
+def receive_and_publish(sockets: list, publish_q: queue.SimpleQueue, running: list):
+    """
+    UDP 수신 → 발행 큐 루프 (단일 스레드)
 
     메시지 포맷: timestamp (8 bytes) + port (2 bytes) + raw packet
+
+    open_multicast_sockets()로 만든 멀티캐스트 소켓을 selectors(Linux: epoll)로 감시하여 수신 가능한 소켓만 읽음
+    소켓마다 make_receiver로 만든 전용 수신 함수를 selector data로 등록해 두고,
+    readable 이벤트가 오면 그 함수만 호출
+    (부하가 높을 때는 select 없이 큐가 빌 때까지 연속으로 읽음)
+    분류된 메시지는 수신 배치 단위 리스트 [(channel, message), ...]로 publish_q에 넣음
+    (Redis 전송 지연이 수신에 영향을 주지 않도록 전송은 redis_writer 스레드가 담당)
     """
-    sock = create_multicast_socket(channel['group'], channel['port'])
-    sock.settimeout(5)
+    counter = stats.new_counter()
 
-    channel_type = channel['type']
-    port_num = channel['port']
+    sel = selectors.DefaultSelector()
+    for ch, sock in sockets:
+        sel.register(sock, selectors.EVENT_READ,
+                     data=make_receiver(ch['type'], ch['port'],
+                                        create_batch_receiver(sock),
+                                        publish_q, counter))
+
+    select = sel.select
 
     while running[0]:
-        try:
-            data, _ = sock.recvfrom(2048)
-            stats.add_received()
-
-            # TR 코드 필터링 (패킷 첫 5바이트)
-            if data[:5] not in TARGET_TR_CODES:
-                continue
-
-            # Redis 채널 결정
-            if channel_type == 'futures':
-                # 선물: ISIN으로 주식선물/지수선물 분류
-                if len(data) >= ISIN_END:
-                    isin = data[ISIN_START:ISIN_END]
-                    redis_channel = classify_futures_isin(isin)
-                else:
-                    redis_channel = 'krx:futures:index'  # 기본값
-            elif channel_type == 'call':
-                # 콜옵션: ISIN으로 주식옵션/지수옵션 분류
-                if len(data) >= ISIN_END:
-                    isin = data[ISIN_START:ISIN_END]
-                    redis_channel = classify_options_isin(isin, 'call')
-                else:
-                    redis_channel = 'krx:options:call:index'  # 기본값
-            elif channel_type == 'put':
-                # 풋옵션: ISIN으로 주식옵션/지수옵션 분류
-                if len(data) >= ISIN_END:
-                    isin = data[ISIN_START:ISIN_END]
-                    redis_channel = classify_options_isin(isin, 'put')
-                else:
-                    redis_channel = 'krx:options:put:index'  # 기본값
-            else:
-                continue
+        for key, _ in select(timeout=LOOP_TIMEOUT):
+            key.data()
+
+    for key in list(sel.get_map().values()):
+        key.fileobj.close()
+    sel.close()
 
-            # 메시지 구성: timestamp + port + raw packet
-            timestamp = struct.pack('d', time.time())
-            port_bytes = struct.pack('H', port_num)
-            message = timestamp + port_bytes + data
 
-            # Redis publish
-            redis_client.publish(redis_channel, message)
-            stats.add(redis_channel)
+def redis_writer(publish_q: queue.SimpleQueue, running: list):
+    """
+    발행 큐 → Redis 전송 루프 (단일 스레드)
+
+    큐에서 첫 배치는 blocking get, 이후 쌓여 있는 배치는 get_nowait로 모아
+    REDIS_BATCH_SIZE개 단위로 RespPublisher에서 한 번에 전송
+    (유입이 많을수록 자동으로 큰 배치가 됨)
+    전송 실패 시 큐에 쌓인 배치까지 버리고, 재접속은 RespPublisher가 backoff 후 시도
+    """
+    counter = stats.new_counter()
+    by_channel = counter['by_channel']
+    publisher = RespPublisher(REDIS_HOST, REDIS_PORT)
+
+    # 메시지마다 반복되는 속성 조회를 지역 변수로 캐싱
+    get = publish_q.get
+    get_nowait = publish_q.get_nowait
+    publish = publisher.publish
+    Empty = queue.Empty
 
-        except socket.timeout:
+    while running[0] or not publish_q.empty():
+        try:
+            batches = [get(timeout=LOOP_TIMEOUT)]
+        except Empty:
             continue
-        except Exception as e:
-            stats.add_error()
 
-    sock.close()
+        count = len(batches[0])
+        try:
+            while count < REDIS_BATCH_SIZE:
+                batch = get_nowait()
+                batches.append(batch)
+                count += len(batch)
+        except Empty:
+            pass
+
+        for batch in batches:
+            for redis_channel, message in batch:
+                publish(redis_channel, message)
+
+        if publisher.flush():
+            counter['published'] += count
+            for batch in batches:
+                for redis_channel, _ in batch:
+                    by_channel[redis_channel] += 1
+        else:
+            # 전송 실패: 큐에 밀린 배치도 모두 버림 (Redis 장애 중 메모리 증가 방지)
+            counter['errors'] += 1
+            try:
+                while True:
+                    count += len(get_nowait())
+            except Empty:
+                pass
+            counter['dropped'] += count
+
+    publisher.close()
 
 
 # ==============================================================================
@@ -387,7 +753,7 @@ def main():
     print(f"    - 콜옵션: 7개 (233.38.231.96:10322~10328)")
     print(f"    - 풋옵션: 7개 (233.38.231.97:10331~10337)")
     print()
-    print("  Redis 발행 채널 (6개):")
+    print("  Redis 발행 스트림 (6개, XADD):")
     print("    - krx:futures:stock       (주식선물)")
     print("    - krx:futures:index       (지수선물)")
     print("    - krx:options:call:stock  (주식콜옵션)")
@@ -402,7 +768,7 @@ def main():
     load_stock_futures_prefixes()
     load_stock_options_prefixes()
 
-    # Redis 연결
+    # Redis 연결 확인 (발행은 redis_writer 스레드의 RespPublisher가 직접 접속)
     try:
         r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
         r.ping()
@@ -411,21 +777,31 @@ def main():
         print(f"[!] Redis 연결 실패: {e}")
         return
 
+    # 멀티캐스트 소켓 생성 (실패한 채널만 제외하고 나머지는 수신)
+    sockets = open_multicast_sockets()
+    if not sockets:
+        print("[!] 수신 가능한 멀티캐스트 채널 없음")
+        return
+
     running = [True]
-    threads = []
+    publish_q = queue.SimpleQueue()
 
     try:
-        # 각 멀티캐스트 채널별 수신 스레드 시작
-        for ch in MULTICAST_CHANNELS:
+        # 전체 멀티캐스트 채널을 하나의 수신 스레드에서 처리
+        # Redis 전송은 별도 writer 스레드 (발행 큐로 연결)
+        for target, args in ((receive_and_publish, (sockets, publish_q, running)),
+                             (redis_writer, (publish_q, running))):
             t = threading.Thread(
-                target=receive_and_publish,
-                args=(ch, r, running),
+                target=target,
+                args=args,
                 daemon=True
             )
-            threads.append(t)
             t.start()
 
-        print(f"[*] {len(threads)}개 수신 스레드 시작")
+        print(f"[*] 수신 스레드 시작 (멀티캐스트 소켓 "
+              f"{len(sockets)}/{len(MULTICAST_CHANNELS)}개: "
+              f"{', '.join(str(ch['port']) for ch, _ in sockets)})")
+        print("[*] Redis 발행 스레드 시작")
         print("[*] Ctrl+C로 종료")
         print()
 
@@ -3,9 +3,9 @@
 ================================================================================
 log_saver.py - Redis 구독 → 파일 저장
 ================================================================================
-역할: Redis 구독 → 파싱 → 텍스트 파일 저장
+역할: Redis Stream 읽기 (consumer group) → 파싱 → 텍스트 파일 저장
 
-구독 채널 (6개):
+구독 스트림 (6개, 필드 'p'에 SISE_receiver 메시지):
 - krx:futures:stock       (주식선물)
 - krx:futures:index       (지수선물)
 - krx:options:call:stock  (주식콜옵션)
@@ -13,7 +13,7 @@ log_saver.py - Redis 구독 → 파일 저장
 - krx:options:put:stock   (주식풋옵션)
 - krx:options:put:index   (지수풋옵션)
 
-저장 경로: D:/MarketData/Logs/YYYY-MM-DD/
+저장 경로: D:/MarketData/Logs/YYYY-MM-DD/ (날짜는 패킷 수신 시각 기준)
 파일명:
 - futures_stock.log       (주식선물)
 - futures_index.log       (지수선물)
@@ -25,7 +25,8 @@ log_saver.py - Redis 구독 → 파일 저장
 로그 포맷: 원본 패킷 그대로 (접속표준서 형식)
 
 장시간 체크: 08:40 ~ 15:50 (파생상품 08:45~15:45 + 버퍼)
-- 장시간 외에는 저장하지 않음
+- 장시간 외에 수신된 패킷은 저장하지 않음
+- 판단 기준은 메시지 헤더의 수신 timestamp (재시작 후 밀린 메시지를 읽는 시각이 아님)
 ================================================================================
 """
 
@@ -61,18 +62,31 @@ REDIS_HOST = CONFIG['redis']['host']
 REDIS_PORT = CONFIG['redis']['port']
 
 # 구독할 Redis 채널 및 파일 매핑
+# 수신 메시지의 채널명(bytes)을 decode 없이 바로 조회하도록 bytes 키 사용
 CHANNEL_FILE_MAP = {
-    'krx:futures:stock': 'futures_stock.log',
-    'krx:futures:index': 'futures_index.log',
-    'krx:options:call:stock': 'options_call_stock.log',
-    'krx:options:call:index': 'options_call_index.log',
-    'krx:options:put:stock': 'options_put_stock.log',
-    'krx:options:put:index': 'options_put_index.log',
+    b'krx:futures:stock': 'futures_stock.log',
+    b'krx:futures:index': 'futures_index.log',
+    b'krx:options:call:stock': 'options_call_stock.log',
+    b'krx:options:call:index': 'options_call_index.log',
+    b'krx:options:put:stock': 'options_put_stock.log',
+    b'krx:options:put:index': 'options_put_index.log',
 }
 
+# Redis Stream 읽기 설정 (consumer group)
+STREAM_GROUP = 'log_saver'
+STREAM_CONSUMER = 'log_saver-1'
+STREAM_FIELD = b'p'          # SISE_receiver의 STREAM_FIELD와 동일
+STREAM_READ_COUNT = 1000     # XREADGROUP 1회당 스트림별 최대 메시지 수
+STREAM_BLOCK_MS = 50         # 새 메시지 대기 시간
+
 # 저장 경로
 LOG_BASE_DIR = Path(CONFIG.get('log_base_dir', 'D:/MarketData/Logs'))
 
+# 파일 기록 설정
+# 메시지마다 write/flush 하지 않고 버퍼에 모아서 FLUSH_INTERVAL(초)마다 기록
+FLUSH_INTERVAL = 0.25
+FILE_BUFFER_SIZE = 1 << 20  # 1 MiB
+
 # 장시간 설정 (파생상품: 08:45~15:45, 버퍼 포함 08:40~15:50)
 MARKET_OPEN_HOUR = 8
 MARKET_OPEN_MINUTE = 40
@@ -82,23 +96,21 @@ MARKET_CLOSE_MINUTE = 50
 # 메시지 포맷
 # SISE_receiver에서 보내는 메시지: timestamp(8) + port(2) + raw_packet
 TIMESTAMP_SIZE = 8
+_UNPACK_D = struct.Struct('<d').unpack_from  # SISE_receiver의 _PACK_D와 동일
 PORT_SIZE = 2
 HEADER_SIZE = TIMESTAMP_SIZE + PORT_SIZE  # 10 bytes
 
 # 패킷 내 필드 위치 (raw_packet 기준)
-TR_CODE_START = 0
-TR_CODE_END = 5
-ISIN_START = 17  # filtered_saver.py와 동일
-ISIN_END = 29    # 12자리 ISIN
+TR_CODE_END = 5  # TR코드: 0-5 (최소 패킷 길이 체크용)
 
 
 # ==============================================================================
 # 장시간 체크
 # ==============================================================================
 
-def is_market_hours() -> bool:
+def is_market_hours(now: datetime = None) -> bool:
     """
-    현재 시각이 장시간인지 체크
+    시각이 장시간인지 체크 (now 생략 시 현재 시각)
 
     파생상품 거래시간: 08:45 ~ 15:45
     버퍼 포함: 08:40 ~ 15:50
@@ -106,7 +118,8 @@ def is_market_hours() -> bool:
     Returns:
         True if 장시간, False otherwise
     """
-    now = datetime.now()
+    if now is None:
+        now = datetime.now()
     current_minutes = now.hour * 60 + now.minute
 
     open_minutes = MARKET_OPEN_HOUR * 60 + MARKET_OPEN_MINUTE  # 08:40 = 520
@@ -115,71 +128,34 @@ def is_market_hours() -> bool:
     return open_minutes <= current_minutes <= close_minutes
 
 
+def classify_timestamp(timestamp: float) -> tuple:
+    """
+    수신 timestamp → (저장 날짜 'YYYY-MM-DD', 장시간 여부)
+
+    밀린 메시지를 나중에 읽어도 수신 당시 날짜/장시간으로 판단하기 위해 사용
+    """
+    received = datetime.fromtimestamp(timestamp)
+    return received.strftime('%Y-%m-%d'), is_market_hours(received)
+
+
 # ==============================================================================
 # 메시지 파싱
 # ==============================================================================
 
-def parse_message(data: bytes) -> dict:
+def parse_message(data: bytes):
     """
-    Redis 메시지 파싱
+    Redis 메시지에서 raw packet 추출
 
     메시지 포맷: timestamp(8) + port(2) + raw_packet
+    로그는 원본 패킷만 저장하므로 port/TR코드/ISIN은 파싱하지 않음
+    (timestamp는 저장 날짜/장시간 판단용)
 
     Returns:
-        {
-            'timestamp': float,      # Unix timestamp
-            'port': int,            # UDP 포트 번호
-            'tr_code': str,         # TR 코드 (5자리)
-            'isin': str,            # ISIN 코드 (12자리)
-            'raw_hex': str,         # Raw packet hex
-            'raw': bytes            # Raw packet bytes
-        }
+        (timestamp, raw packet bytes), 메시지가 너무 짧으면 None
     """
     if len(data) < HEADER_SIZE + TR_CODE_END:
         return None
-
-    try:
-        # 헤더 파싱
-        timestamp = struct.unpack('d', data[:TIMESTAMP_SIZE])[0]
-        port = struct.unpack('H', data[TIMESTAMP_SIZE:HEADER_SIZE])[0]
-
-        # Raw packet
-        raw = data[HEADER_SIZE:]
-
-        # TR 코드
-        tr_code = raw[TR_CODE_START:TR_CODE_END].decode('ascii', errors='ignore')
-
-        # ISIN 코드
-        if len(raw) >= ISIN_END:
-            isin = raw[ISIN_START:ISIN_END].decode('ascii', errors='ignore')
-        else:
-            isin = ''
-
-        # Raw hex
-        raw_hex = raw.hex()
-
-        return {
-            'timestamp': timestamp,
-            'port': port,
-            'tr_code': tr_code,
-            'isin': isin,
-            'raw_hex': raw_hex,
-            'raw': raw
-        }
-    except Exception:
-        return None
-
-
-def format_log_line(parsed: dict) -> str:
-    """
-    파싱된 데이터를 로그 라인으로 포맷
-
-    포맷: 원본 패킷 그대로 (접속표준서 형식)
-    - 0~4: TR코드
-    - 17~28: ISIN
-    - 등등... 접속표준서 참조
-    """
-    return parsed['raw'].decode('ascii', errors='ignore').strip()
+    return _UNPACK_D(data)[0], data[HEADER_SIZE:]
 
 
 # ==============================================================================
@@ -187,53 +163,125 @@ def format_log_line(parsed: dict) -> str:
 # ==============================================================================
 
 class LogFileManager:
-    """날짜별 로그 파일 관리"""
+    """
+    날짜별 로그 파일 관리
+
+    날짜는 호출자가 패킷 수신 시각으로 정해서 넘김 (밀린 메시지도 수신 날짜 파일에 기록)
+    write_lines()는 (날짜, 채널)별 메모리 버퍼에 추가만 하고,
+    백그라운드 스레드가 FLUSH_INTERVAL마다 버퍼를 모아 파일에 한 번에 기록
+    ack가 주어지면 파일 기록(flush) 후에 해당 엔트리 ID로 ack(channel, ids) 호출
+    """
 
-    def __init__(self, base_dir: Path):
+    def __init__(self, base_dir: Path, ack=None):
         self.base_dir = base_dir
-        self.files = {}  # channel -> file handle
-        self.current_date = None
-        self.lock = threading.Lock()
+        self.ack = ack
+        self.files = {}  # (date, channel) -> file handle
+        self.current_date = None  # 기록한 가장 최근 날짜 (이전 날짜 파일은 flush 후 닫음)
+        self.lock = threading.Lock()        # buffers/stats 보호
+        self.file_lock = threading.Lock()   # files 보호 (디스크 쓰기 중에도 write_lines() 가능)
+        self.buffers = {}  # (date, channel) -> lines
+        self.ack_ids = {ch: [] for ch in CHANNEL_FILE_MAP}  # 기록 후 ACK할 엔트리 ID
         self.stats = {ch: 0 for ch in CHANNEL_FILE_MAP}
 
-    def _get_today_dir(self) -> Path:
-        """오늘 날짜 디렉토리 반환"""
-        today = datetime.now().strftime('%Y-%m-%d')
-        today_dir = self.base_dir / today
-        today_dir.mkdir(parents=True, exist_ok=True)
-        return today_dir
+        self.running = True
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
 
-    def _get_file(self, channel: str):
-        """채널에 해당하는 파일 핸들 반환"""
-        today = datetime.now().strftime('%Y-%m-%d')
+    def _get_date_dir(self, date: str) -> Path:
+        """날짜 디렉토리 반환"""
+        date_dir = self.base_dir / date
+        date_dir.mkdir(parents=True, exist_ok=True)
+        return date_dir
 
-        # 날짜가 바뀌면 기존 파일 닫고 새로 열기
-        if self.current_date != today:
-            self._close_all()
-            self.current_date = today
-
-        if channel not in self.files:
+    def _get_file(self, date: str, channel: bytes):
+        """날짜/채널에 해당하는 파일 핸들 반환"""
+        key = (date, channel)
+        if key not in self.files:
             filename = CHANNEL_FILE_MAP.get(channel)
             if not filename:
                 return None
 
-            filepath = self._get_today_dir() / filename
-            self.files[channel] = open(filepath, 'a', encoding='utf-8')
+            filepath = self._get_date_dir(date) / filename
+            self.files[key] = open(filepath, 'a', encoding='utf-8',
+                                   buffering=FILE_BUFFER_SIZE)
             print(f"[*] 파일 오픈: {filepath}")
 
-        return self.files[channel]
+        return self.files[key]
+
+    def write_lines(self, channel: bytes, lines_by_date: dict, entry_ids=()):
+        """
+        로그 라인 여러 개를 한 번에 저장 (lock 1회), entry_ids는 기록 후 ACK
+
+        lines_by_date: {수신 날짜 'YYYY-MM-DD': [라인, ...]}
 
-    def write(self, channel: str, log_line: str):
-        """로그 라인 저장"""
+        close() 이후에는 기록할 flush가 없으므로 버리고 False 반환
+        (ACK도 하지 않으므로 재시작 시 pending에서 다시 처리됨)
+        """
         with self.lock:
-            f = self._get_file(channel)
-            if f:
-                f.write(log_line + '\n')
-                f.flush()
+            if not self.running:
+                return False
+            if channel not in self.stats:
+                return True
+            buffers = self.buffers
+            for date, log_lines in lines_by_date.items():
+                buffer = buffers.get((date, channel))
+                if buffer is None:
+                    buffers[(date, channel)] = log_lines
+                else:
+                    buffer.extend(log_lines)
 
                 # 통계 업데이트
-                if channel in self.stats:
-                    self.stats[channel] += 1
+                self.stats[channel] += len(log_lines)
+            self.ack_ids[channel].extend(entry_ids)
+        return True
+
+    def flush(self):
+        """버퍼에 쌓인 라인을 날짜/채널별로 한 번에 기록"""
+        with self.lock:
+            buffers = self.buffers
+            self.buffers = {}
+            ack_ids = self.ack_ids
+            self.ack_ids = {ch: [] for ch in CHANNEL_FILE_MAP}
+
+        with self.file_lock:
+            for (date, channel), lines in sorted(buffers.items()):
+                if not lines:
+                    continue
+                f = self._get_file(date, channel)
+                if f:
+                    lines.append('')  # 마지막 줄 개행
+                    f.write('\n'.join(lines))
+                if self.current_date is None or date > self.current_date:
+                    self.current_date = date
+
+            for f in self.files.values():
+                f.flush()
+
+            # 최근 날짜가 아닌 파일 (날짜 변경/밀린 메시지 기록분)은 닫기
+            for key in [key for key in self.files if key[0] != self.current_date]:
+                try:
+                    self.files.pop(key).close()
+                except OSError:
+                    pass
+
+        # 디스크에 기록된 뒤에만 ACK (실패 시 pending으로 남아 재시작 때 다시 처리)
+        if self.ack:
+            for channel, ids in ack_ids.items():
+                if not ids:
+                    continue
+                try:
+                    self.ack(channel, ids)
+                except Exception as e:
+                    print(f"[!] ACK 에러: {e}")
+
+    def _flush_loop(self):
+        """FLUSH_INTERVAL마다 flush (백그라운드 스레드)"""
+        while self.running:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[!] 파일 기록 에러: {e}")
 
     def _close_all(self):
         """모든 파일 닫기"""
@@ -245,8 +293,12 @@ class LogFileManager:
         self.files.clear()
 
     def close(self):
-        """종료 시 호출"""
+        """종료 시 호출 (남은 버퍼 기록 후 파일 닫기)"""
         with self.lock:
+            self.running = False  # 이후 write_lines()는 거부
+        self.flusher.join(timeout=FLUSH_INTERVAL * 4)
+        self.flush()
+        with self.file_lock:
             self._close_all()
 
     def get_stats(self) -> dict:
@@ -259,55 +311,115 @@ class LogFileManager:
 # Redis 구독 → 파일 저장
 # ==============================================================================
 
+def create_groups(r: redis.Redis, channels: list):
+    """스트림별 consumer group 생성 (스트림이 없으면 함께 생성)"""
+    for channel in channels:
+        try:
+            r.xgroup_create(channel, STREAM_GROUP, id='$', mkstream=True)
+        except redis.exceptions.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):  # 이미 그룹이 있으면 이어서 읽음
+                raise
+
+
 def subscribe_and_save(file_manager: LogFileManager, running: list):
     """
-    Redis 구독 → 파싱 → 파일 저장 루프
+    Redis Stream 읽기 → 파싱 → 파일 저장 루프
 
-    구조: redis_saver.py 패턴 (single thread, subscribe all channels)
+    구조: single thread, consumer group으로 6개 스트림을 한 번에 읽음
+    - XREADGROUP으로 최대 STREAM_READ_COUNT개씩 배치 수신
+    - XACK는 file_manager가 파일에 기록한 뒤에 보냄
+    - 시작 시 이전 실행에서 ACK하지 못한 메시지(pending)부터 다시 처리
     """
     r = redis.Redis(host=REDIS_HOST, port=REDIS_PORT)
-    pubsub = r.pubsub()
 
     channels = list(CHANNEL_FILE_MAP.keys())
-    pubsub.subscribe(*channels)
+    create_groups(r, channels)
 
-    print(f"[*] Redis 구독 시작: {channels}")
+    print(f"[*] Redis 스트림 읽기 시작 (group={STREAM_GROUP}): "
+          f"{[ch.decode() for ch in channels]}")
+
+    # '0': 내 pending 메시지부터, 다 읽으면 '>': 새 메시지
+    streams = {channel: '0' for channel in channels}
 
     skipped_out_of_hours = 0
 
-    for message in pubsub.listen():
-        if not running[0]:
-            break
+    # 수신 timestamp → (날짜, 장시간) 변환은 같은 초 안에서는 결과가 같으므로 캐싱
+    last_second = None
+    date = None
+    in_hours = False
 
-        if message['type'] != 'message':
-            continue
+    # 메시지마다 반복되는 전역/속성 조회를 지역 변수로 캐싱 (LOAD_FAST)
+    xreadgroup = r.xreadgroup
+    write_lines = file_manager.write_lines
+    parse = parse_message
+    classify = classify_timestamp
+    field = STREAM_FIELD
 
+    while running[0]:
         try:
-            channel = message['channel'].decode()
-            data = message['data']
+            response = xreadgroup(STREAM_GROUP, STREAM_CONSUMER, streams,
+                                  count=STREAM_READ_COUNT, block=STREAM_BLOCK_MS)
+        except redis.exceptions.ConnectionError as e:
+            print(f"[!] Redis 연결 에러: {e}")
+            time.sleep(1)
+            continue
+        except redis.exceptions.ResponseError as e:
+            if 'NOGROUP' not in str(e):
+                raise
+            # Redis 재시작(비영속)/DEL/XGROUP DESTROY로 스트림·그룹이 사라진 경우
+            print(f"[!] consumer group 없음, 재생성: {e}")
+            try:
+                create_groups(r, channels)
+            except redis.exceptions.RedisError as e:
+                print(f"[!] consumer group 생성 에러: {e}")
+                time.sleep(1)
+            continue
 
-            # 장시간 체크
-            if not is_market_hours():
-                skipped_out_of_hours += 1
-                if skipped_out_of_hours % 1000 == 0:
-                    print(f"[!] 장외시간 스킵: {skipped_out_of_hours:,}건")
-                continue
+        if not response:
+            continue
 
-            # 메시지 파싱
-            parsed = parse_message(data)
-            if not parsed:
+        for channel, entries in response:
+            if not entries:
+                streams[channel] = '>'  # pending 처리 완료
                 continue
+            if streams[channel] != '>':
+                streams[channel] = entries[-1][0]  # pending 다음 위치부터
 
-            # 로그 포맷 변환
-            log_line = format_log_line(parsed)
-
-            # 파일에 저장
-            file_manager.write(channel, log_line)
+            try:
+                lines_by_date = {}
+                prev_skipped = skipped_out_of_hours
+                for entry_id, fields in entries:
+                    # 메시지 파싱 (trim된 pending 메시지는 fields가 비어 있음)
+                    parsed = parse(fields.get(field, b'')) if fields else None
+                    if parsed is None:
+                        continue
+                    timestamp, raw = parsed
+
+                    # 장시간/저장 날짜는 메시지별 수신 시각으로 판단
+                    # (재시작 후 밀린 메시지를 읽는 현재 시각이 아님)
+                    second = int(timestamp)
+                    if second != last_second:
+                        last_second = second
+                        date, in_hours = classify(timestamp)
+                    if not in_hours:
+                        skipped_out_of_hours += 1
+                        continue
+
+                    # 로그 포맷: 원본 패킷 그대로, 접속표준서 형식
+                    lines = lines_by_date.get(date)
+                    if lines is None:
+                        lines = lines_by_date[date] = []
+                    lines.append(raw.decode('ascii', errors='ignore').strip())
+
+                if skipped_out_of_hours // 1000 > prev_skipped // 1000:
+                    print(f"[!] 장외시간 스킵: {skipped_out_of_hours:,}건")
 
-        except Exception as e:
-            print(f"[!] 저장 에러: {e}")
+                # 파일에 저장 (배치 단위로 한 번에 버퍼에 추가)
+                # 장외 스킵/파싱 실패분 포함 배치 전체를 파일 기록 후 ACK
+                write_lines(channel, lines_by_date, [entry_id for entry_id, _ in entries])
 
-    pubsub.close()
+            except Exception as e:
+                print(f"[!] 저장 에러: {e}")
 
 
 # ==============================================================================
@@ -322,7 +434,7 @@ def main():
     print(f"  저장 경로: {LOG_BASE_DIR}")
     print(f"  구독 채널: {len(CHANNEL_FILE_MAP)}개")
     for ch, filename in CHANNEL_FILE_MAP.items():
-        print(f"    {ch} → {filename}")
+        print(f"    {ch.decode()} → {filename}")
     print(f"  장 시간: {MARKET_OPEN_HOUR:02d}:{MARKET_OPEN_MINUTE:02d} ~ "
           f"{MARKET_CLOSE_HOUR:02d}:{MARKET_CLOSE_MINUTE:02d}")
     print(f"  로그 포맷: 원본 패킷 그대로 (접속표준서 형식)")
@@ -341,18 +453,21 @@ def main():
         print(f"[!] Redis 연결 실패: {e}")
         return
 
-    file_manager = LogFileManager(LOG_BASE_DIR)
+    file_manager = LogFileManager(
+        LOG_BASE_DIR,
+        ack=lambda channel, ids: r.xack(channel, STREAM_GROUP, *ids)
+    )
     running = [True]
 
-    try:
-        # 저장 스레드 시작
-        t = threading.Thread(
-            target=subscribe_and_save,
-            args=(file_manager, running),
-            daemon=True
-        )
-        t.start()
+    # 저장 스레드 시작
+    t = threading.Thread(
+        target=subscribe_and_save,
+        args=(file_manager, running),
+        daemon=True
+    )
+    t.start()
 
+    try:
         print("[*] 저장 시작. Ctrl+C로 종료")
         print()
 
@@ -371,27 +486,28 @@ def main():
 
             market_status = "장중" if is_market_hours() else "장외"
             print(f"[상태] {datetime.now().strftime('%H:%M:%S')} [{market_status}] - "
-                  f"주선:{stats['krx:futures:stock']:,} "
-                  f"지선:{stats['krx:futures:index']:,} "
-                  f"주콜:{stats['krx:options:call:stock']:,} "
-                  f"지콜:{stats['krx:options:call:index']:,} "
-                  f"주풋:{stats['krx:options:put:stock']:,} "
-                  f"지풋:{stats['krx:options:put:index']:,} "
+                  f"주선:{stats[b'krx:futures:stock']:,} "
+                  f"지선:{stats[b'krx:futures:index']:,} "
+                  f"주콜:{stats[b'krx:options:call:stock']:,} "
+                  f"지콜:{stats[b'krx:options:call:index']:,} "
+                  f"주풋:{stats[b'krx:options:put:stock']:,} "
+                  f"지풋:{stats[b'krx:options:put:index']:,} "
                   f"(총 {total:,}건)")
 
     except KeyboardInterrupt:
         print("\n[*] 종료 요청...")
     finally:
         running[0] = False
+        t.join()  # 처리 중인 XREADGROUP 배치까지 버퍼에 넣은 뒤 close
         file_manager.close()
         stats = file_manager.get_stats()
         total = sum(stats.values())
-        print(f"[*] 최종: 주선:{stats['krx:futures:stock']:,} "
-              f"지선:{stats['krx:futures:index']:,} "
-              f"주콜:{stats['krx:options:call:stock']:,} "
-              f"지콜:{stats['krx:options:call:index']:,} "
-              f"주풋:{stats['krx:options:put:stock']:,} "
-              f"지풋:{stats['krx:options:put:index']:,} "
+        print(f"[*] 최종: 주선:{stats[b'krx:futures:stock']:,} "
+              f"지선:{stats[b'krx:futures:index']:,} "
+              f"주콜:{stats[b'krx:options:call:stock']:,} "
+              f"지콜:{stats[b'krx:options:call:index']:,} "
+              f"주풋:{stats[b'krx:options:put:stock']:,} "
+              f"지풋:{stats[b'krx:options:put:index']:,} "
               f"(총 {total:,}건)")
         print("[*] 프로그램 종료")
 
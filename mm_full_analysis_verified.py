@@ -9,9 +9,26 @@ DS투자증권 6개 종목 × 12 옵션 = 72개 전체 분석
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
 import json
+import mmap
+import os
 import re
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from typing import Any, MutableSequence, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba 미설치 시 순수 Python으로 실행
+    njit = None
+
+try:
+    import orjson
+except ImportError:  # orjson 미설치 시 표준 json 사용
+    orjson = None
 
 # 파일 경로
 LOG_DATE = "2026-01-22"
@@ -27,6 +44,10 @@ DUTY_END_SEC = 15 * 3600 + 20 * 60   # 55200
 TOTAL_DUTY_SECONDS = DUTY_END_SEC - DUTY_START_SEC  # 22500초
 PAIRING_WINDOW_MS = 100
 
+# MM 상태 비트 (timeline 기록용)
+MM1_PRESENT = 1
+MM2_PRESENT = 2
+
 # DS투자증권 담당 종목 (product_id로 매핑)
 DS_STOCKS = {
     "KRDRVOPS14": {"name": "KT", "partner": "키움증권"},
@@ -39,33 +60,104 @@ DS_STOCKS = {
 
 OPTION_LEVELS = ["ITM1", "ATM", "OTM1", "OTM2", "OTM3", "OTM4"]
 
+# 로그 라인 필드 위치 (접속표준서 호가 패킷, 로그는 ASCII라 문자 위치 = 바이트 위치)
+MIN_LINE_LENGTH = 280                 # 개행 포함 라인 길이
+ISIN_COLS = np.arange(17, 29)         # 종목코드 (12자리)
+TIME_COLS = np.arange(35, 47)         # 시각 HHMMSSuuuuuu (12자리)
+# 1~5호가 매도/매수 잔량 (각 9자리): shape (5호가, 매도/매수, 9)
+HOGA_COLS = np.array([[np.arange(base + 18, base + 27), np.arange(base + 27, base + 36)]
+                      for base in range(47, 47 + 5 * 46, 46)])
+POW10_9 = 10 ** np.arange(8, -1, -1, dtype=np.int64)
+
+
+def load_json(path: str) -> Any:
+    """JSON 파일 로드 (orjson이 있으면 orjson으로 파싱)"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
 
-def load_duty_requirements():
+def load_duty_requirements() -> dict:
     """Q값 로드"""
-    with open(DUTY_FILE, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = load_json(DUTY_FILE)
     return data['stock_options_duty']
 
 
-def load_master():
+def load_master(master_file: str) -> dict:
     """Master 파일 로드"""
-    with open(MASTER_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return load_json(master_file)
 
 
-def parse_time_to_seconds(time_str):
+def parse_time_to_seconds(time_str: str) -> float:
     return int(time_str[0:2]) * 3600 + int(time_str[2:4]) * 60 + int(time_str[4:6]) + int(time_str[6:12]) / 1000000
 
 
-def extract_strike(name):
+# ASCII 숫자/공백만 인정 (바이트 스캐너와 같은 규칙, numba 설치 여부와 무관하게 같은 결과)
+STRIKE_RE = re.compile(r'(\d{1,3}(?:,\d{3})*)\s*\(', re.ASCII)
+
+
+def _extract_strike_bytes(name: bytes) -> int:
+    """
+    extract_strike의 바이트 스캐너 버전 (numba 컴파일용)
+
+    '(' 앞의 공백을 건너뛰고 오른쪽에서 왼쪽으로 '숫자 3자리 + 쉼표' 그룹을 읽어서
+    STRIKE_RE와 같은 값을 계산 (가장 앞의 '('부터 매칭되는 것을 사용)
+    숫자/공백은 ASCII만 인정 (STRIKE_RE의 re.ASCII와 동일)
+    """
+    n = len(name)
+    for k in range(n):
+        if name[k] != 0x28:  # '('
+            continue
+
+        # \s* (공백 건너뛰기)
+        end = k
+        while end > 0 and (name[end - 1] == 0x20 or 0x09 <= name[end - 1] <= 0x0D):
+            end -= 1
+
+        # \d{1,3}(?:,\d{3})* 의 가장 왼쪽 시작 위치
+        start = -1
+        pos = end
+        while True:
+            digits = 0
+            while pos - digits > 0 and 0x30 <= name[pos - digits - 1] <= 0x39:
+                digits += 1
+            if digits == 0:
+                break
+            if digits == 3 and pos - 4 > 0 and name[pos - 4] == 0x2C and 0x30 <= name[pos - 5] <= 0x39:
+                start = pos - 3
+                pos -= 4  # ',ddd' 그룹, 계속 왼쪽으로
+                continue
+            start = pos - min(digits, 3)
+            break
+
+        if start < 0:
+            continue
+
+        value = 0
+        for i in range(start, end):
+            if name[i] != 0x2C:
+                value = value * 10 + (name[i] - 0x30)
+        return value
+    return 0
+
+
+if njit is not None:
+    _extract_strike_bytes = njit(cache=True)(_extract_strike_bytes)
+
+
+def extract_strike(name: str) -> int:
     """종목명에서 행사가 추출: 'LG디스플레 C 202602    12,000(  10)' -> 12000"""
-    match = re.search(r'(\d{1,3}(?:,\d{3})*)\s*\(', name)
+    if njit is not None:
+        return _extract_strike_bytes(name.encode('utf-8'))
+    match = STRIKE_RE.search(name)
     if match:
         return int(match.group(1).replace(',', ''))
     return 0
 
 
-def get_underlying_name(name):
+def get_underlying_name(name: str) -> str:
     """종목명에서 기초자산명 추출"""
     parts = name.split()
     if parts:
@@ -73,34 +165,52 @@ def get_underlying_name(name):
     return ''
 
 
-def classify_options_for_stock(master, underlying_name):
-    """특정 기초자산의 옵션들을 ATM/ITM/OTM으로 분류"""
+def index_master(master: dict) -> dict:
+    """
+    Master를 기초자산별 콜/풋 옵션 목록으로 변환 (1회)
 
-    # 해당 기초자산의 모든 옵션 찾기
-    calls = []
-    puts = []
+    Returns:
+        {기초자산명: (calls, puts)}
+    """
+    index = defaultdict(lambda: ([], []))
 
     for isin, info in master.items():
         name = info.get('종목명', '')
-        if not name.startswith(underlying_name):
+        if ' C ' in name:
+            options = index[get_underlying_name(name)][0]
+        elif ' P ' in name:
+            options = index[get_underlying_name(name)][1]
+        else:
             continue
 
-        expiry = info.get('만기일', '')[:6]  # 202602
-        strike = extract_strike(name)
-        atm_flag = info.get('ATM구분', '')  # 1=ATM, 2=ITM, 3=OTM
-
-        opt_info = {
+        options.append({
             'isin': isin,
             'name': name,
-            'strike': strike,
-            'expiry': expiry,
-            'atm_flag': atm_flag
-        }
+            'strike': extract_strike(name),
+            'expiry': info.get('만기일', '')[:6],  # 202602
+            'atm_flag': info.get('ATM구분', '')  # 1=ATM, 2=ITM, 3=OTM
+        })
 
-        if ' C ' in name:
-            calls.append(opt_info)
-        elif ' P ' in name:
-            puts.append(opt_info)
+    return dict(index)
+
+
+@lru_cache(maxsize=None)
+def load_master_index(master_file: str) -> dict:
+    """Master 파일 로드 + 기초자산별 인덱스 (날짜별 파일이라 파일당 1회만 로드)"""
+    return index_master(load_master(master_file))
+
+
+@lru_cache(maxsize=None)
+def classify_options_for_stock(master_file: str, underlying_name: str
+                               ) -> Tuple[Optional[str], Optional[dict], Optional[dict]]:
+    """
+    특정 기초자산의 옵션들을 ATM/ITM/OTM으로 분류
+
+    (master_file, 기초자산) 단위로 결과를 캐싱 - 반환값은 수정하지 말 것
+    """
+
+    # 해당 기초자산의 모든 옵션
+    calls, puts = load_master_index(master_file).get(underlying_name, ([], []))
 
     # 최근월물 찾기
     all_expiries = set(c['expiry'] for c in calls) | set(p['expiry'] for p in puts)
@@ -165,7 +275,7 @@ def classify_options_for_stock(master, underlying_name):
     return nearest_expiry, call_classified, put_classified
 
 
-def parse_hoga(line, hoga_num):
+def parse_hoga(line: str, hoga_num: int) -> Tuple[int, int]:
     """호가 파싱"""
     base = 47 + (hoga_num - 1) * 46
     try:
@@ -174,298 +284,453 @@ def parse_hoga(line, hoga_num):
         return 0, 0
 
 
-def load_packets(log_file, target_isins):
-    """패킷 로드"""
-    packets = defaultdict(list)
-    with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
-        for line in f:
-            if len(line) < 280:
-                continue
-            isin = line[17:29]
-            if isin in target_isins:
-                try:
-                    time_str = line[35:47]
-                    time_sec = parse_time_to_seconds(time_str)
-                    if not (DUTY_START_SEC <= time_sec <= DUTY_END_SEC):
-                        continue
-                    total_ask, total_bid = 0, 0
-                    for i in range(1, 6):
-                        a, b = parse_hoga(line, i)
-                        total_ask += a
-                        total_bid += b
-                    packets[isin].append({
-                        'time_str': time_str,
-                        'time_sec': time_sec,
-                        'ask': total_ask,
-                        'bid': total_bid
-                    })
-                except:
-                    pass
-    for isin in packets:
-        packets[isin].sort(key=lambda x: x['time_sec'])
-    return packets
-
+def parse_line(line: str) -> Optional[Tuple[str, float, int, int]]:
+    """
+    라인 하나 문자열 파싱 (숫자 외 문자가 섞인 라인용)
 
-class MMTrackerV3:
-    """MM 상태 추적기 - 승격 없이 개별 추적"""
-
-    def __init__(self, q_size):
-        self.Q = q_size
-        self.mm1 = None
-        self.mm2 = None
-        self.timeline = []
-        self.baseline_ask = None
-        self.baseline_bid = None
-
-    def record_state(self, time_sec):
-        self.timeline.append({
-            'time_sec': time_sec,
-            'mm1_present': self.mm1 is not None,
-            'mm2_present': self.mm2 is not None
-        })
-
-    def mm1_enter(self, ask_q, bid_q, time_sec):
-        self.mm1 = {'ask_q': ask_q, 'bid_q': bid_q}
-        self.record_state(time_sec)
-
-    def mm2_enter(self, ask_q, bid_q, time_sec):
-        self.mm2 = {'ask_q': ask_q, 'bid_q': bid_q}
-        self.record_state(time_sec)
-
-    def mm1_exit(self, time_sec):
-        self.mm1 = None  # 승격 없음!
-        self.record_state(time_sec)
+    Returns:
+        (time_str, time_sec, ask, bid), 시간 파싱 실패 시 None
+    """
+    try:
+        time_str = line[35:47]
+        time_sec = parse_time_to_seconds(time_str)
+        total_ask, total_bid = 0, 0
+        for i in range(1, 6):
+            a, b = parse_hoga(line, i)
+            total_ask += a
+            total_bid += b
+        return time_str, time_sec, total_ask, total_bid
+    except:
+        return None
 
-    def mm2_exit(self, time_sec):
-        self.mm2 = None
-        self.record_state(time_sec)
 
+def load_packets(log_file: str, target_isins: set) -> dict:
+    """
+    패킷 로드
+
+    로그 파일을 mmap으로 열어서 복사/디코딩 없이 uint8 배열로 바로 파싱
+    """
+    with open(log_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:  # 빈 파일은 mmap 불가
+            return {}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # parse_packets가 끝나면 mmap 버퍼 참조가 해제되어 close 가능
+            return parse_packets(np.frombuffer(mm, dtype=np.uint8), target_isins)
+
+
+def load_call_put_packets(call_isins: set, put_isins: set) -> Tuple[dict, dict]:
+    """
+    CALL/PUT 로그 동시 로드
+
+    두 파일은 서로 독립이고 파일 읽기/NumPy 연산은 GIL을 놓으므로 스레드 2개로 병렬 처리
+
+    Returns:
+        (call_packets, put_packets)
+    """
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        call_future = executor.submit(load_packets, CALL_LOG, call_isins)
+        put_future = executor.submit(load_packets, PUT_LOG, put_isins)
+        return call_future.result(), put_future.result()
+
+
+def parse_packets(buf: np.ndarray, target_isins: set) -> dict:
+    """
+    로그 버퍼 파싱 (NumPy 일괄 파싱)
+
+    개행 위치로 라인 시작 위치만 구한 뒤,
+    ISIN/시간/호가 필드를 (라인 시작 + 필드 열) 인덱싱으로 모든 라인에서 한 번에 추출
+    - 시간: HHMMSS + 마이크로초 자리별 숫자 계산
+    - 호가: 1~5호가 매도/매수 잔량을 자리수 가중합 후 합산
+    숫자/앞쪽 공백 외의 문자가 섞인 라인만 기존 문자열 파싱(parse_line)으로 처리
+
+    Returns:
+        {ISIN: {'time_sec': float64 배열, 'ask': int64 배열, 'bid': int64 배열}} (시간순)
+    """
+    # 라인 시작/끝 위치 (끝 = '\n' 위치, 마지막 라인은 파일 끝)
+    newlines = np.flatnonzero(buf == 0x0A)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.concatenate((newlines, [len(buf)]))
+
+    # text 모드 기준 라인 길이 ('\r\n' → '\n', 개행 포함)
+    has_newline = np.ones(len(starts), dtype=np.int64)
+    has_newline[-1] = 0
+    has_cr = np.zeros(len(starts), dtype=np.int64)
+    has_cr[:-1] = (newlines > starts[:-1]) & (buf[newlines - 1] == 0x0D)
+    lengths = ends - starts + has_newline - has_cr
+    starts = starts[lengths >= MIN_LINE_LENGTH]
+
+    # 대상 ISIN 라인만 선택 (정렬된 대상 ISIN 배열에 searchsorted로 일괄 조회)
+    targets = np.array(sorted(target_isins), dtype='S12')
+    if len(targets) == 0:
+        return {}
+    isins = np.ascontiguousarray(buf[starts[:, None] + ISIN_COLS]).view('S12').ravel()
+    buckets = np.minimum(np.searchsorted(targets, isins), len(targets) - 1)
+    hit = targets[buckets] == isins
+    starts = starts[hit]
+    buckets = buckets[hit]  # 라인별 대상 ISIN 번호 (targets 인덱스)
+
+    # 시간 파싱: 자리별 ASCII 숫자 계산 (HH*3600 + MM*60 + SS + uuuuuu/1e6)
+    time_bytes = buf[starts[:, None] + TIME_COLS]
+    time_valid = ((time_bytes >= 0x30) & (time_bytes <= 0x39)).all(axis=1)
+    time_digits = time_bytes.astype(np.int64) - 0x30
+    time_sec = ((time_digits[:, 0] * 10 + time_digits[:, 1]) * 3600 +
+                (time_digits[:, 2] * 10 + time_digits[:, 3]) * 60 +
+                (time_digits[:, 4] * 10 + time_digits[:, 5])).astype(np.float64)
+    time_sec += (time_digits[:, 6:] @ POW10_9[3:]) / 1000000
+
+    # 의무시간 밖 라인은 호가 파싱 전에 제외 (시간 파싱 불가 라인은 문자열 파싱에서 판정)
+    keep = ~time_valid | ((time_sec >= DUTY_START_SEC) & (time_sec <= DUTY_END_SEC))
+    starts = starts[keep]
+    buckets = buckets[keep]
+    time_sec = time_sec[keep]
+    time_valid = time_valid[keep]
+
+    # 호가 잔량: 앞쪽 공백 + 숫자만 허용 (int(strip())과 같은 값)
+    hoga_bytes = buf[starts[:, None] + HOGA_COLS.ravel()].reshape(-1, 5, 2, 9)
+    hoga_digit = (hoga_bytes >= 0x30) & (hoga_bytes <= 0x39)
+    hoga_space = hoga_bytes == 0x20
+    hoga_values = np.where(hoga_digit, hoga_bytes - 0x30, 0).astype(np.uint8) @ POW10_9
+    total_ask = hoga_values[:, :, 0].sum(axis=1)
+    total_bid = hoga_values[:, :, 1].sum(axis=1)
+
+    valid = (time_valid &
+             (hoga_digit | hoga_space).all(axis=(1, 2, 3)) &
+             ~(hoga_digit[..., :-1] & hoga_space[..., 1:]).any(axis=(1, 2, 3)))
+
+    in_duty = valid.copy()
+
+    # 그 외 라인은 문자열 파싱 (파싱 실패 라인은 제외)
+    for row in np.flatnonzero(~valid):
+        line = buf[starts[row]:starts[row] + MIN_LINE_LENGTH].tobytes().decode('utf-8', errors='ignore')
+        parsed = parse_line(line)
+        if parsed is None:
+            continue
+        _, time_sec[row], total_ask[row], total_bid[row] = parsed
+        in_duty[row] = DUTY_START_SEC <= time_sec[row] <= DUTY_END_SEC
+
+    # ISIN별로 모으기: ISIN 번호로 한 번 정렬(stable - 파일 순서 유지)해서 ISIN별 구간이 연속되도록 배치
+    rows = np.flatnonzero(in_duty)
+    rows = rows[np.argsort(buckets[rows], kind='stable')]
+    counts = np.bincount(buckets[rows], minlength=len(targets))
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    time_sec = time_sec[rows]
+    total_ask = total_ask[rows]
+    total_bid = total_bid[rows]
+
+    # ISIN별 시간순 정렬 (같은 시간은 파일 순서 유지)
+    # 로그는 대부분 이미 시간순이므로 순서가 맞으면 정렬 생략
+    packets = {}
+    for bucket in np.flatnonzero(counts):
+        part = slice(bounds[bucket], bounds[bucket + 1])
+        isin_time, isin_ask, isin_bid = time_sec[part], total_ask[part], total_bid[part]
+        if (np.diff(isin_time) < 0).any():
+            order = np.argsort(isin_time, kind='stable')
+            isin_time, isin_ask, isin_bid = isin_time[order], isin_ask[order], isin_bid[order]
+        packets[targets[bucket].decode()] = {
+            'time_sec': isin_time,
+            'ask': isin_ask,
+            'bid': isin_bid
+        }
+    return packets
 
-def analyze_option_v3(packets, q):
-    """v3 로직: MM1/MM2 개별 추적 (승격 없음)"""
-    if len(packets) < 2:
-        return None
 
-    tracker = MMTrackerV3(q)
-
-    # 모든 변화 추적
-    all_changes = []
-    for i in range(1, len(packets)):
-        prev, curr = packets[i-1], packets[i]
-        delta_ask = curr['ask'] - prev['ask']
-        delta_bid = curr['bid'] - prev['bid']
-
-        if delta_ask != 0 or delta_bid != 0:
-            all_changes.append({
-                'time_sec': curr['time_sec'],
-                'delta_ask': delta_ask,
-                'delta_bid': delta_bid,
-                'delta_ask_q': delta_ask // q if delta_ask >= 0 else -(abs(delta_ask) // q),
-                'delta_bid_q': delta_bid // q if delta_bid >= 0 else -(abs(delta_bid) // q),
-                'prev_ask': prev['ask'],
-                'prev_bid': prev['bid'],
-                'is_q_multiple_ask': abs(delta_ask) >= q and abs(delta_ask) % q == 0,
-                'is_q_multiple_bid': abs(delta_bid) >= q and abs(delta_bid) % q == 0,
-                'processed': False
-            })
+def pairing_window_end(times: np.ndarray) -> np.ndarray:
+    """
+    변화별 100ms 페어링 윈도우 끝 인덱스
+
+    window_end[i] = (times[j] - times[i]) * 1000 > PAIRING_WINDOW_MS인 첫 j
+    (times는 시간순이라 searchsorted로 한 번에 구하고, 부동소수점 경계만 같은 비교식으로 보정)
+    """
+    n = len(times)
+    first = np.arange(1, n + 1)
+    window_end = np.maximum(np.searchsorted(times, times + PAIRING_WINDOW_MS / 1000, side='right'), first)
+
+    while True:
+        shrink = (window_end > first) & ((times[window_end - 1] - times) * 1000 > PAIRING_WINDOW_MS)
+        if not shrink.any():
+            break
+        window_end[shrink] -= 1
+
+    while True:
+        grow = (window_end < n) & ((times[np.minimum(window_end, n - 1)] - times) * 1000 <= PAIRING_WINDOW_MS)
+        if not grow.any():
+            break
+        window_end[grow] += 1
+
+    return window_end
+
+
+def _run_tracker(times: Sequence[float], window_end: Sequence[int],
+                 deltas_ask: Sequence[int], deltas_bid: Sequence[int],
+                 deltas_ask_q: Sequence[int], deltas_bid_q: Sequence[int],
+                 ask_q_multiple: Sequence[bool], bid_q_multiple: Sequence[bool],
+                 prev_ask: Sequence[int], prev_bid: Sequence[int],
+                 processed: MutableSequence[int], q: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    MM 상태 추적 - 승격 없이 MM1/MM2 개별 추적 (numba 컴파일용)
+
+    MM1/MM2 상태(잔량 Q배수)와 기준 잔량(baseline)은 스칼라로,
+    상태 변화 기록(timeline)은 미리 할당한 배열로 관리
+
+    Args:
+        times, deltas_ask, deltas_bid, prev_ask, prev_bid: 잔량이 바뀐 패킷별 값 (시간순)
+        window_end: 100ms 페어링 윈도우 끝 인덱스 (pairing_window_end)
+        deltas_ask_q, deltas_bid_q: 잔량 변화 / Q (0 방향으로 버림)
+        ask_q_multiple, bid_q_multiple: 잔량 변화가 Q의 배수인지 (|변화| >= Q)
+        processed: 처리 완료 표시 (0으로 초기화된 uint8 배열)
+        q: 의무수량
+        (numba 사용 시 ndarray, 순수 Python 실행 시 list/bytearray로 전달됨)
+
+    Returns:
+        (timeline_times, timeline_states) - 상태 변화 시각, MM1_PRESENT | MM2_PRESENT 비트
+    """
+    n_changes = len(times)
+
+    # 변화 1건당 조용한 퇴장 + 페어링 이벤트로 최대 2번 기록
+    timeline_times = np.empty(2 * n_changes, dtype=np.float64)
+    timeline_states = np.empty(2 * n_changes, dtype=np.int8)
+    n_timeline = 0
+
+    mm1 = False
+    mm1_ask_q = 0
+    mm1_bid_q = 0
+    mm2 = False
+    mm2_ask_q = 0
+    mm2_bid_q = 0
+    has_baseline = False
+    baseline_ask = 0
+    baseline_bid = 0
 
     # 메인 처리 루프
     i = 0
-    while i < len(all_changes):
-        change = all_changes[i]
-        if change['processed']:
+    while i < n_changes:
+        if processed[i]:
             i += 1
             continue
 
-        time_sec = change['time_sec']
-        delta_ask = change['delta_ask']
-        delta_bid = change['delta_bid']
-        delta_ask_q = change['delta_ask_q']
-        delta_bid_q = change['delta_bid_q']
+        time_sec = times[i]
+        delta_ask = deltas_ask[i]
+        delta_bid = deltas_bid[i]
+        delta_ask_q = deltas_ask_q[i]
+        delta_bid_q = deltas_bid_q[i]
 
         # 상태 불일치 체크 (잔량 검증)
-        if tracker.mm1 or tracker.mm2:
+        if (mm1 or mm2) and has_baseline:
             expected_mm_ask = 0
             expected_mm_bid = 0
-            if tracker.mm1:
-                expected_mm_ask += tracker.mm1['ask_q'] * q
-                expected_mm_bid += tracker.mm1['bid_q'] * q
-            if tracker.mm2:
-                expected_mm_ask += tracker.mm2['ask_q'] * q
-                expected_mm_bid += tracker.mm2['bid_q'] * q
-
-            if tracker.baseline_ask is not None:
-                actual_mm_ask = change['prev_ask'] - tracker.baseline_ask
-                actual_mm_bid = change['prev_bid'] - tracker.baseline_bid
-
-                if actual_mm_ask < expected_mm_ask - q//2 or actual_mm_bid < expected_mm_bid - q//2:
-                    missing_ask = expected_mm_ask - actual_mm_ask
-                    missing_bid = expected_mm_bid - actual_mm_bid
-
-                    if tracker.mm2:
-                        mm2_ask = tracker.mm2['ask_q'] * q
-                        mm2_bid = tracker.mm2['bid_q'] * q
-                        if abs(missing_ask - mm2_ask) < q and abs(missing_bid - mm2_bid) < q:
-                            tracker.mm2_exit(time_sec)
-                        elif tracker.mm1:
-                            mm1_ask = tracker.mm1['ask_q'] * q
-                            mm1_bid = tracker.mm1['bid_q'] * q
-                            if abs(missing_ask - mm1_ask) < q and abs(missing_bid - mm1_bid) < q:
-                                tracker.mm1_exit(time_sec)
-                    elif tracker.mm1:
-                        mm1_ask = tracker.mm1['ask_q'] * q
-                        mm1_bid = tracker.mm1['bid_q'] * q
-                        if abs(missing_ask - mm1_ask) < q and abs(missing_bid - mm1_bid) < q:
-                            tracker.mm1_exit(time_sec)
-
-        # 100ms 페어링
-        paired_event = None
-        curr_is_ask_q = change['is_q_multiple_ask'] and delta_ask != 0
-        curr_is_bid_q = change['is_q_multiple_bid'] and delta_bid != 0
+            if mm1:
+                expected_mm_ask += mm1_ask_q * q
+                expected_mm_bid += mm1_bid_q * q
+            if mm2:
+                expected_mm_ask += mm2_ask_q * q
+                expected_mm_bid += mm2_bid_q * q
+
+            actual_mm_ask = prev_ask[i] - baseline_ask
+            actual_mm_bid = prev_bid[i] - baseline_bid
+
+            if actual_mm_ask < expected_mm_ask - q//2 or actual_mm_bid < expected_mm_bid - q//2:
+                missing_ask = expected_mm_ask - actual_mm_ask
+                missing_bid = expected_mm_bid - actual_mm_bid
+
+                exited = False
+                if mm2:
+                    if abs(missing_ask - mm2_ask_q * q) < q and abs(missing_bid - mm2_bid_q * q) < q:
+                        mm2 = False
+                        exited = True
+                    elif mm1:
+                        if abs(missing_ask - mm1_ask_q * q) < q and abs(missing_bid - mm1_bid_q * q) < q:
+                            mm1 = False  # 승격 없음!
+                            exited = True
+                elif mm1:
+                    if abs(missing_ask - mm1_ask_q * q) < q and abs(missing_bid - mm1_bid_q * q) < q:
+                        mm1 = False
+                        exited = True
+
+                if exited:
+                    timeline_times[n_timeline] = time_sec
+                    timeline_states[n_timeline] = mm1 * MM1_PRESENT + mm2 * MM2_PRESENT
+                    n_timeline += 1
+
+        # 100ms 페어링 (방향: 1 = 진입(+), -1 = 퇴장(-))
+        paired = False
+        paired_ask_q = 0
+        paired_bid_q = 0
+        direction = 0
+        curr_is_ask_q = ask_q_multiple[i] and delta_ask != 0
+        curr_is_bid_q = bid_q_multiple[i] and delta_bid != 0
 
         if curr_is_ask_q and not curr_is_bid_q:
-            direction = '+' if delta_ask > 0 else '-'
-            for j in range(i+1, len(all_changes)):
-                other = all_changes[j]
-                if other['processed']:
+            direction = 1 if delta_ask > 0 else -1
+            for j in range(i+1, window_end[i]):
+                if processed[j]:
                     continue
-                if (other['time_sec'] - time_sec) * 1000 > PAIRING_WINDOW_MS:
-                    break
-                if other['is_q_multiple_bid'] and other['delta_ask'] == 0:
-                    other_direction = '+' if other['delta_bid'] > 0 else '-'
+                if bid_q_multiple[j] and deltas_ask[j] == 0:
+                    other_direction = 1 if deltas_bid[j] > 0 else -1
                     if direction == other_direction:
-                        paired_event = {
-                            'ask_q': delta_ask_q,
-                            'bid_q': other['delta_bid_q'],
-                            'direction': direction,
-                            'time_sec': time_sec
-                        }
-                        other['processed'] = True
+                        paired = True
+                        paired_ask_q = delta_ask_q
+                        paired_bid_q = deltas_bid_q[j]
+                        processed[j] = 1
                         break
 
         elif curr_is_bid_q and not curr_is_ask_q:
-            direction = '+' if delta_bid > 0 else '-'
-            for j in range(i+1, len(all_changes)):
-                other = all_changes[j]
-                if other['processed']:
+            direction = 1 if delta_bid > 0 else -1
+            for j in range(i+1, window_end[i]):
+                if processed[j]:
                     continue
-                if (other['time_sec'] - time_sec) * 1000 > PAIRING_WINDOW_MS:
-                    break
-                if other['is_q_multiple_ask'] and other['delta_bid'] == 0:
-                    other_direction = '+' if other['delta_ask'] > 0 else '-'
+                if ask_q_multiple[j] and deltas_bid[j] == 0:
+                    other_direction = 1 if deltas_ask[j] > 0 else -1
                     if direction == other_direction:
-                        paired_event = {
-                            'ask_q': other['delta_ask_q'],
-                            'bid_q': delta_bid_q,
-                            'direction': direction,
-                            'time_sec': time_sec
-                        }
-                        other['processed'] = True
+                        paired = True
+                        paired_ask_q = deltas_ask_q[j]
+                        paired_bid_q = delta_bid_q
+                        processed[j] = 1
                         break
 
         elif curr_is_ask_q and curr_is_bid_q:
-            ask_dir = '+' if delta_ask > 0 else '-'
-            bid_dir = '+' if delta_bid > 0 else '-'
+            ask_dir = 1 if delta_ask > 0 else -1
+            bid_dir = 1 if delta_bid > 0 else -1
             if ask_dir == bid_dir:
-                paired_event = {
-                    'ask_q': delta_ask_q,
-                    'bid_q': delta_bid_q,
-                    'direction': ask_dir,
-                    'time_sec': time_sec
-                }
+                paired = True
+                paired_ask_q = delta_ask_q
+                paired_bid_q = delta_bid_q
+                direction = ask_dir
 
         # 페어링된 이벤트 처리
-        if paired_event:
-            change['processed'] = True
-            ask_q_val = abs(paired_event['ask_q'])
-            bid_q_val = abs(paired_event['bid_q'])
-            direction = paired_event['direction']
-
-            if direction == '+':
-                if tracker.mm1 is None:
-                    if tracker.baseline_ask is None:
-                        tracker.baseline_ask = change['prev_ask']
-                        tracker.baseline_bid = change['prev_bid']
-                    tracker.mm1_enter(ask_q_val, bid_q_val, time_sec)
-                elif tracker.mm2 is None:
-                    tracker.mm2_enter(ask_q_val, bid_q_val, time_sec)
+        if paired:
+            processed[i] = 1
+            ask_q_val = abs(paired_ask_q)
+            bid_q_val = abs(paired_bid_q)
+            changed = False
+
+            if direction == 1:
+                if not mm1:
+                    if not has_baseline:
+                        has_baseline = True
+                        baseline_ask = prev_ask[i]
+                        baseline_bid = prev_bid[i]
+                    mm1 = True
+                    mm1_ask_q = ask_q_val
+                    mm1_bid_q = bid_q_val
+                    changed = True
+                elif not mm2:
+                    mm2 = True
+                    mm2_ask_q = ask_q_val
+                    mm2_bid_q = bid_q_val
+                    changed = True
             else:
-                exit_pattern = (ask_q_val, bid_q_val)
-                mm1_match = tracker.mm1 and (tracker.mm1['ask_q'], tracker.mm1['bid_q']) == exit_pattern
-                mm2_match = tracker.mm2 and (tracker.mm2['ask_q'], tracker.mm2['bid_q']) == exit_pattern
-
-                if mm1_match and mm2_match:
-                    tracker.mm2_exit(time_sec)
-                elif mm2_match:
-                    tracker.mm2_exit(time_sec)
+                mm1_match = mm1 and mm1_ask_q == ask_q_val and mm1_bid_q == bid_q_val
+                mm2_match = mm2 and mm2_ask_q == ask_q_val and mm2_bid_q == bid_q_val
+
+                if mm2_match:  # 둘 다 일치하면 MM2 퇴장
+                    mm2 = False
+                    changed = True
                 elif mm1_match:
-                    tracker.mm1_exit(time_sec)
+                    mm1 = False
+                    changed = True
+
+            if changed:
+                timeline_times[n_timeline] = time_sec
+                timeline_states[n_timeline] = mm1 * MM1_PRESENT + mm2 * MM2_PRESENT
+                n_timeline += 1
 
-        change['processed'] = True
+        processed[i] = 1
         i += 1
 
+    return timeline_times[:n_timeline], timeline_states[:n_timeline]
+
+
+if njit is not None:
+    _run_tracker = njit(cache=True, nogil=True)(_run_tracker)
+
+
+def accumulate(initial: float, values: np.ndarray) -> float:
+    """initial부터 values를 순서대로 더한 값 (np.sum의 pairwise 합과 달리 순차 누적과 같은 반올림)"""
+    return float(np.cumsum(np.concatenate(([initial], values)))[-1])
+
+
+def analyze_option_v3(packets: dict, q: int) -> Optional[dict]:
+    """v3 로직: MM1/MM2 개별 추적 (승격 없음)"""
+    times = packets['time_sec']
+    asks = packets['ask']
+    bids = packets['bid']
+    if len(times) < 2:
+        return None
+
+    # 모든 변화 추적 (잔량이 바뀐 패킷만, 배열별로 분리)
+    deltas_ask = np.diff(asks)
+    deltas_bid = np.diff(bids)
+    changed = np.flatnonzero((deltas_ask != 0) | (deltas_bid != 0))
+
+    change_times = times[1:][changed]
+    deltas_ask = deltas_ask[changed]
+    deltas_bid = deltas_bid[changed]
+
+    # Q 단위 변화량 / Q 배수 여부 (음수는 0 방향으로 버림)
+    abs_ask = np.abs(deltas_ask)
+    abs_bid = np.abs(deltas_bid)
+    deltas_ask_q = np.sign(deltas_ask) * (abs_ask // q)
+    deltas_bid_q = np.sign(deltas_bid) * (abs_bid // q)
+    ask_q_multiple = (abs_ask >= q) & (abs_ask % q == 0)
+    bid_q_multiple = (abs_bid >= q) & (abs_bid % q == 0)
+
+    columns = (change_times, pairing_window_end(change_times), deltas_ask, deltas_bid,
+               deltas_ask_q, deltas_bid_q, ask_q_multiple, bid_q_multiple,
+               asks[:-1][changed], bids[:-1][changed])
+
+    if njit is not None:
+        processed = np.zeros(len(changed), dtype=np.uint8)
+    else:
+        # 순수 Python 루프에서는 ndarray 원소 접근보다 list/bytearray가 빠름
+        columns = tuple(column.tolist() for column in columns)
+        processed = bytearray(len(changed))
+
+    timeline_times, timeline_states = _run_tracker(*columns, processed, q)
+
     # 시간 계산
-    first_time = packets[0]['time_sec']
-    last_time = packets[-1]['time_sec']
+    first_time = float(times[0])
+    last_time = float(times[-1])
 
-    if not tracker.timeline:
-        tracker.timeline.append({'time_sec': first_time, 'mm1_present': False, 'mm2_present': False})
+    if len(timeline_times) == 0:
+        timeline_times = np.array([first_time])
+        timeline_states = np.zeros(1, dtype=np.int8)
 
-    mm1_total_time = 0.0
-    mm2_total_time = 0.0
-    only_mm1_time = 0.0
-    only_mm2_time = 0.0
-    both_time = 0.0
     none_time = 0.0
 
     if first_time > DUTY_START_SEC:
         none_time += first_time - DUTY_START_SEC
 
-    if tracker.timeline[0]['time_sec'] > first_time:
-        none_time += tracker.timeline[0]['time_sec'] - first_time
+    if timeline_times[0] > first_time:
+        none_time += float(timeline_times[0]) - first_time
 
-    for idx, state in enumerate(tracker.timeline):
-        if idx < len(tracker.timeline) - 1:
-            duration = tracker.timeline[idx+1]['time_sec'] - state['time_sec']
-        else:
-            duration = last_time - state['time_sec']
-
-        if duration < 0:
-            continue
+    # 상태별 유지시간 (다음 상태 변화까지, 마지막 상태는 데이터 끝까지)
+    durations = np.diff(timeline_times, append=last_time)
+    counted = durations >= 0
+    mm1_here = (timeline_states & MM1_PRESENT) != 0
+    mm2_here = (timeline_states & MM2_PRESENT) != 0
 
-        mm1_here = state['mm1_present']
-        mm2_here = state['mm2_present']
-
-        if mm1_here:
-            mm1_total_time += duration
-        if mm2_here:
-            mm2_total_time += duration
-
-        if mm1_here and mm2_here:
-            both_time += duration
-        elif mm1_here and not mm2_here:
-            only_mm1_time += duration
-        elif not mm1_here and mm2_here:
-            only_mm2_time += duration
-        else:
-            none_time += duration
+    mm1_total_time = accumulate(0.0, durations[counted & mm1_here])
+    mm2_total_time = accumulate(0.0, durations[counted & mm2_here])
+    both_time = accumulate(0.0, durations[counted & mm1_here & mm2_here])
+    only_mm1_time = accumulate(0.0, durations[counted & mm1_here & ~mm2_here])
+    only_mm2_time = accumulate(0.0, durations[counted & ~mm1_here & mm2_here])
+    none_time = accumulate(none_time, durations[counted & ~mm1_here & ~mm2_here])
 
-    if last_time < DUTY_END_SEC and tracker.timeline:
+    if last_time < DUTY_END_SEC:
         post_data = DUTY_END_SEC - last_time
-        last_state = tracker.timeline[-1]
-        mm1_here = last_state['mm1_present']
-        mm2_here = last_state['mm2_present']
+        last_mm1 = mm1_here[-1]
+        last_mm2 = mm2_here[-1]
 
-        if mm1_here:
+        if last_mm1:
             mm1_total_time += post_data
-        if mm2_here:
+        if last_mm2:
             mm2_total_time += post_data
 
-        if mm1_here and mm2_here:
+        if last_mm1 and last_mm2:
             both_time += post_data
-        elif mm1_here and not mm2_here:
+        elif last_mm1 and not last_mm2:
             only_mm1_time += post_data
-        elif not mm1_here and mm2_here:
+        elif not last_mm1 and last_mm2:
             only_mm2_time += post_data
         else:
             none_time += post_data
@@ -477,11 +742,11 @@ def analyze_option_v3(packets, q):
         'only_mm2_rate': only_mm2_time / TOTAL_DUTY_SECONDS * 100,
         'both_rate': both_time / TOTAL_DUTY_SECONDS * 100,
         'none_rate': none_time / TOTAL_DUTY_SECONDS * 100,
-        'packets': len(packets)
+        'packets': len(times)
     }
 
 
-def main():
+def main() -> None:
     print("=" * 100)
     print(f"DS투자증권 72개 옵션 전체 분석")
     print(f"분석 날짜: {LOG_DATE}")
@@ -490,7 +755,34 @@ def main():
 
     # 데이터 로드
     duty_data = load_duty_requirements()
-    master = load_master()
+
+    # 전 종목 분석 대상 옵션 (종류, ISIN, Q)을 모아서 CALL/PUT 로그를 한 번씩만 로드
+    targets = []
+    for product_id, stock_info in DS_STOCKS.items():
+        if product_id not in duty_data:
+            continue
+        q_values = duty_data[product_id]['duty_qty']
+        _, call_classified, put_classified = classify_options_for_stock(MASTER_FILE, stock_info['name'])
+        if not call_classified or not put_classified:
+            continue
+        for option_type, classified in (('CALL', call_classified), ('PUT', put_classified)):
+            for level, opt in classified.items():
+                targets.append((option_type, opt['isin'], q_values.get(level, 0)))
+
+    all_call_isins = {isin for option_type, isin, _ in targets if option_type == 'CALL'}
+    all_put_isins = {isin for option_type, isin, _ in targets if option_type == 'PUT'}
+
+    print(f"패킷 로딩 중... (CALL {len(all_call_isins)}개, PUT {len(all_put_isins)}개)")
+    call_packets, put_packets = load_call_put_packets(all_call_isins, all_put_isins)
+
+    # 옵션별 분석 병렬 실행 (numba 컴파일된 추적 루프는 GIL을 놓으므로 스레드로 병렬 처리)
+    packets_by_type = {'CALL': call_packets, 'PUT': put_packets}
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        analyses = {
+            (option_type, isin, q): executor.submit(analyze_option_v3, packets_by_type[option_type][isin], q)
+            for option_type, isin, q in targets
+            if q > 0 and isin in packets_by_type[option_type]
+        }
 
     all_results = []
 
@@ -509,7 +801,7 @@ def main():
         q_values = duty_data[product_id]['duty_qty']
 
         # 옵션 분류
-        nearest_expiry, call_classified, put_classified = classify_options_for_stock(master, stock_name)
+        nearest_expiry, call_classified, put_classified = classify_options_for_stock(MASTER_FILE, stock_name)
 
         if not call_classified or not put_classified:
             print(f"  [오류] 옵션 분류 실패")
@@ -517,15 +809,6 @@ def main():
 
         print(f"최근월물: {nearest_expiry}")
 
-        # ISIN 수집
-        call_isins = {opt['isin']: (level, opt) for level, opt in call_classified.items()}
-        put_isins = {opt['isin']: (level, opt) for level, opt in put_classified.items()}
-
-        # 패킷 로드
-        print(f"패킷 로딩 중...")
-        call_packets = load_packets(CALL_LOG, set(call_isins.keys()))
-        put_packets = load_packets(PUT_LOG, set(put_isins.keys()))
-
         # CALL 분석
         print(f"\n[CALL 옵션]")
         for level in OPTION_LEVELS:
@@ -542,9 +825,10 @@ def main():
             isin = opt['isin']
             strike = opt['strike']
             q = q_values.get(level, 0)
-            packets = call_packets.get(isin, [])
+            packets = call_packets.get(isin)
+            n_packets = len(packets['time_sec']) if packets else 0
 
-            result = analyze_option_v3(packets, q) if packets and q > 0 else None
+            result = analyses[('CALL', isin, q)].result() if n_packets and q > 0 else None
 
             if result:
                 all_results.append({
@@ -563,10 +847,10 @@ def main():
                 all_results.append({
                     'stock': stock_name, 'partner': partner,
                     'type': 'CALL', 'level': level, 'isin': isin, 'strike': strike, 'q': q,
-                    'packets': len(packets), 'mm1_rate': '-', 'mm2_rate': '-',
+                    'packets': n_packets, 'mm1_rate': '-', 'mm2_rate': '-',
                     'only_mm1': '-', 'only_mm2': '-', 'both': '-', 'none': '-'
                 })
-                print(f"  {level}: {strike:,}원 (Q={q}) -> 분석 불가 (패킷={len(packets)})")
+                print(f"  {level}: {strike:,}원 (Q={q}) -> 분석 불가 (패킷={n_packets})")
 
         # PUT 분석
         print(f"\n[PUT 옵션]")
@@ -584,9 +868,10 @@ def main():
             isin = opt['isin']
             strike = opt['strike']
             q = q_values.get(level, 0)
-            packets = put_packets.get(isin, [])
+            packets = put_packets.get(isin)
+            n_packets = len(packets['time_sec']) if packets else 0
 
-            result = analyze_option_v3(packets, q) if packets and q > 0 else None
+            result = analyses[('PUT', isin, q)].result() if n_packets and q > 0 else None
 
             if result:
                 all_results.append({
@@ -605,68 +890,72 @@ def main():
                 all_results.append({
                     'stock': stock_name, 'partner': partner,
                     'type': 'PUT', 'level': level, 'isin': isin, 'strike': strike, 'q': q,
-                    'packets': len(packets), 'mm1_rate': '-', 'mm2_rate': '-',
+                    'packets': n_packets, 'mm1_rate': '-', 'mm2_rate': '-',
                     'only_mm1': '-', 'only_mm2': '-', 'both': '-', 'none': '-'
                 })
-                print(f"  {level}: {strike:,}원 (Q={q}) -> 분석 불가 (패킷={len(packets)})")
+                print(f"  {level}: {strike:,}원 (Q={q}) -> 분석 불가 (패킷={n_packets})")
 
     # MD 파일 생성
     print(f"\n\n결과 파일 생성 중: {OUTPUT_FILE}")
 
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        f.write(f"# DS투자증권 MM 의무이행률 분석 결과\n\n")
-        f.write(f"- **분석 날짜**: {LOG_DATE}\n")
-        f.write(f"- **분석 시간**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"- **의무시간**: 09:05:00 ~ 15:20:00 ({TOTAL_DUTY_SECONDS}초 = {TOTAL_DUTY_SECONDS/60:.0f}분)\n")
-        f.write(f"- **분석 로직**: v3 (MM1/MM2 개별 추적, 승격 없음, 패턴 매칭 퇴장 감지)\n\n")
+    # 보고서는 조각을 모아서 한 번에 기록
+    parts = []
+    parts.append(f"# DS투자증권 MM 의무이행률 분석 결과\n\n")
+    parts.append(f"- **분석 날짜**: {LOG_DATE}\n")
+    parts.append(f"- **분석 시간**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    parts.append(f"- **의무시간**: 09:05:00 ~ 15:20:00 ({TOTAL_DUTY_SECONDS}초 = {TOTAL_DUTY_SECONDS/60:.0f}분)\n")
+    parts.append(f"- **분석 로직**: v3 (MM1/MM2 개별 추적, 승격 없음, 패턴 매칭 퇴장 감지)\n\n")
 
-        f.write("---\n\n")
+    parts.append("---\n\n")
 
-        # 전체 72개 테이블
-        f.write("## 전체 72개 옵션 분석 결과\n\n")
-        f.write("| # | 기초자산 | 파트너 | 종류 | 레벨 | ISIN | 행사가 | Q | 패킷수 | MM1 의무이행률 | MM2 의무이행률 | MM1만 | MM2만 | 둘 다 | 없음 |\n")
-        f.write("|---|----------|--------|------|------|------|--------|---|--------|----------------|----------------|-------|-------|-------|------|\n")
+    # 전체 72개 테이블
+    parts.append("## 전체 72개 옵션 분석 결과\n\n")
+    parts.append("| # | 기초자산 | 파트너 | 종류 | 레벨 | ISIN | 행사가 | Q | 패킷수 | MM1 의무이행률 | MM2 의무이행률 | MM1만 | MM2만 | 둘 다 | 없음 |\n")
+    parts.append("|---|----------|--------|------|------|------|--------|---|--------|----------------|----------------|-------|-------|-------|------|\n")
 
-        for idx, r in enumerate(all_results, 1):
-            strike_str = f"{r['strike']:,}" if isinstance(r['strike'], int) else r['strike']
-            f.write(f"| {idx} | {r['stock']} | {r['partner']} | {r['type']} | {r['level']} | {r['isin']} | {strike_str} | {r['q']} | {r['packets']} | {r['mm1_rate']} | {r['mm2_rate']} | {r['only_mm1']} | {r['only_mm2']} | {r['both']} | {r['none']} |\n")
+    for idx, r in enumerate(all_results, 1):
+        strike_str = f"{r['strike']:,}" if isinstance(r['strike'], int) else r['strike']
+        parts.append(f"| {idx} | {r['stock']} | {r['partner']} | {r['type']} | {r['level']} | {r['isin']} | {strike_str} | {r['q']} | {r['packets']} | {r['mm1_rate']} | {r['mm2_rate']} | {r['only_mm1']} | {r['only_mm2']} | {r['both']} | {r['none']} |\n")
 
-        f.write("\n---\n\n")
+    parts.append("\n---\n\n")
 
-        # 종목별 요약
-        f.write("## 종목별 ATM 요약\n\n")
-        f.write("| 기초자산 | 파트너 | CALL ATM MM1 | CALL ATM MM2 | PUT ATM MM1 | PUT ATM MM2 |\n")
-        f.write("|----------|--------|--------------|--------------|-------------|-------------|\n")
+    # 종목별 요약
+    parts.append("## 종목별 ATM 요약\n\n")
+    parts.append("| 기초자산 | 파트너 | CALL ATM MM1 | CALL ATM MM2 | PUT ATM MM1 | PUT ATM MM2 |\n")
+    parts.append("|----------|--------|--------------|--------------|-------------|-------------|\n")
 
-        for product_id, stock_info in DS_STOCKS.items():
-            stock_name = stock_info['name']
-            partner = stock_info['partner']
+    for product_id, stock_info in DS_STOCKS.items():
+        stock_name = stock_info['name']
+        partner = stock_info['partner']
 
-            call_atm = next((r for r in all_results if r['stock'] == stock_name and r['type'] == 'CALL' and r['level'] == 'ATM'), None)
-            put_atm = next((r for r in all_results if r['stock'] == stock_name and r['type'] == 'PUT' and r['level'] == 'ATM'), None)
+        call_atm = next((r for r in all_results if r['stock'] == stock_name and r['type'] == 'CALL' and r['level'] == 'ATM'), None)
+        put_atm = next((r for r in all_results if r['stock'] == stock_name and r['type'] == 'PUT' and r['level'] == 'ATM'), None)
 
-            call_mm1 = call_atm['mm1_rate'] if call_atm else '-'
-            call_mm2 = call_atm['mm2_rate'] if call_atm else '-'
-            put_mm1 = put_atm['mm1_rate'] if put_atm else '-'
-            put_mm2 = put_atm['mm2_rate'] if put_atm else '-'
+        call_mm1 = call_atm['mm1_rate'] if call_atm else '-'
+        call_mm2 = call_atm['mm2_rate'] if call_atm else '-'
+        put_mm1 = put_atm['mm1_rate'] if put_atm else '-'
+        put_mm2 = put_atm['mm2_rate'] if put_atm else '-'
 
-            f.write(f"| {stock_name} | {partner} | {call_mm1} | {call_mm2} | {put_mm1} | {put_mm2} |\n")
+        parts.append(f"| {stock_name} | {partner} | {call_mm1} | {call_mm2} | {put_mm1} | {put_mm2} |\n")
 
-        f.write("\n---\n\n")
+    parts.append("\n---\n\n")
 
-        # 통계
-        f.write("## 통계\n\n")
+    # 통계
+    parts.append("## 통계\n\n")
 
-        total = len(all_results)
-        valid = [r for r in all_results if r['mm1_rate'] != '-']
+    total = len(all_results)
+    valid = [r for r in all_results if r['mm1_rate'] != '-']
 
-        mm1_above_85 = sum(1 for r in valid if float(r['mm1_rate'].replace('%', '')) >= 85)
-        mm2_above_85 = sum(1 for r in valid if float(r['mm2_rate'].replace('%', '')) >= 85)
+    mm1_above_85 = sum(1 for r in valid if float(r['mm1_rate'].replace('%', '')) >= 85)
+    mm2_above_85 = sum(1 for r in valid if float(r['mm2_rate'].replace('%', '')) >= 85)
 
-        f.write(f"- **총 옵션 수**: {total}\n")
-        f.write(f"- **분석 성공**: {len(valid)}\n")
-        f.write(f"- **MM1 85% 이상**: {mm1_above_85}/{len(valid)} ({mm1_above_85/len(valid)*100:.1f}%)\n")
-        f.write(f"- **MM2 85% 이상**: {mm2_above_85}/{len(valid)} ({mm2_above_85/len(valid)*100:.1f}%)\n")
+    parts.append(f"- **총 옵션 수**: {total}\n")
+    parts.append(f"- **분석 성공**: {len(valid)}\n")
+    parts.append(f"- **MM1 85% 이상**: {mm1_above_85}/{len(valid)} ({mm1_above_85/len(valid)*100:.1f}%)\n")
+    parts.append(f"- **MM2 85% 이상**: {mm2_above_85}/{len(valid)} ({mm2_above_85/len(valid)*100:.1f}%)\n")
+
+    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        f.write(''.join(parts))
 
     print(f"\n완료! 결과 파일: {OUTPUT_FILE}")
 
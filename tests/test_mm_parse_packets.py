@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+mm_full_analysis_verified.parse_packets 회귀 테스트
+
+NumPy 바이트 파싱(parse_packets)이 기존 문자열 파싱(라인별 parse_line)과
+같은 결과를 내는지 합성 로그 라인으로 비교
+
+실행: python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import mm_full_analysis_verified as mm  # noqa: E402
+
+ISIN_A = 'KR4201VC1234'
+ISIN_B = 'KR4301VC5678'
+ISIN_OTHER = 'KR4201VC9999'
+LINE_CHARS = mm.MIN_LINE_LENGTH - 1  # 개행 제외 라인 길이
+
+
+def make_line(isin: str, time_str: str, hoga=None, length: int = LINE_CHARS) -> str:
+    """
+    합성 호가 라인 생성
+
+    hoga: [(매도잔량 문자열, 매수잔량 문자열), ...] 5개, 각 9자리 (생략 시 숫자 우측 정렬)
+    """
+    if hoga is None:
+        hoga = [(f'{100 * i:9d}', f'{200 * i:9d}') for i in range(1, 6)]
+    line = list('B602F' + '0' * (length - 5))
+    line[17:29] = isin
+    line[35:47] = time_str
+    for i, (ask, bid) in enumerate(hoga):
+        base = 47 + i * 46
+        line[base + 18:base + 27] = ask
+        line[base + 27:base + 36] = bid
+    return ''.join(line[:length])
+
+
+def reference_packets(log_file: str, target_isins: set) -> dict:
+    """기존 문자열 파싱 (text 모드 라인 + parse_line, ISIN별 시간순 stable 정렬)"""
+    packets = defaultdict(list)
+    with open(log_file, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            if len(line) < mm.MIN_LINE_LENGTH or line[17:29] not in target_isins:
+                continue
+            parsed = mm.parse_line(line)
+            if parsed is None:
+                continue
+            _, time_sec, ask, bid = parsed
+            if mm.DUTY_START_SEC <= time_sec <= mm.DUTY_END_SEC:
+                packets[line[17:29]].append((time_sec, ask, bid))
+    for rows in packets.values():
+        rows.sort(key=lambda row: row[0])
+    return packets
+
+
+class ParsePacketsTest(unittest.TestCase):
+
+    def assert_same_as_parse_line(self, data: bytes, target_isins: set = None):
+        if target_isins is None:
+            target_isins = {ISIN_A, ISIN_B}
+        fd, path = tempfile.mkstemp(suffix='.log')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            expected = reference_packets(path, target_isins)
+            actual = mm.load_packets(path, target_isins)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(sorted(actual), sorted(expected))
+        for isin, rows in expected.items():
+            self.assertEqual(list(zip(actual[isin]['time_sec'].tolist(),
+                                      actual[isin]['ask'].tolist(),
+                                      actual[isin]['bid'].tolist())), rows, isin)
+        return actual
+
+    def test_plain_lines(self):
+        lines = [make_line(ISIN_A, f'10{m:02d}00123456') for m in range(5)]
+        lines.append(make_line(ISIN_B, '110000000001'))
+        actual = self.assert_same_as_parse_line(('\n'.join(lines) + '\n').encode())
+        self.assertEqual(len(actual[ISIN_A]['time_sec']), 5)
+
+    def test_crlf_and_mixed_newlines(self):
+        lines = [make_line(ISIN_A, f'10{m:02d}00000000') for m in range(4)]
+        data = (lines[0] + '\r\n' + lines[1] + '\n' + lines[2] + '\r\n' + lines[3] + '\r\n')
+        self.assert_same_as_parse_line(data.encode())
+
+    def test_line_length_boundary(self):
+        # text 모드 기준 (개행 포함) MIN_LINE_LENGTH 미만 라인은 제외
+        short = make_line(ISIN_A, '100000000000', length=LINE_CHARS - 1)
+        exact = make_line(ISIN_A, '100001000000')
+        data = short + '\r\n' + exact + '\r\n' + short + '\n'
+        actual = self.assert_same_as_parse_line(data.encode())
+        self.assertEqual(len(actual[ISIN_A]['time_sec']), 1)
+
+    def test_no_final_newline(self):
+        # 마지막 라인은 개행이 없으므로 한 글자 더 길어야 포함됨
+        data = (make_line(ISIN_A, '100000000000') + '\n' +
+                make_line(ISIN_A, '100001000000') + '\n' +
+                make_line(ISIN_B, '100002000000', length=LINE_CHARS + 1))
+        self.assert_same_as_parse_line(data.encode())
+        data = make_line(ISIN_A, '100000000000') + '\n' + make_line(ISIN_B, '100002000000')
+        actual = self.assert_same_as_parse_line(data.encode())
+        self.assertNotIn(ISIN_B, actual)
+
+    def test_trailing_spaces_signs_and_garbage(self):
+        hoga_cases = [
+            [('1234     ', '     5678')] + [('        0', '        0')] * 4,  # 뒤쪽 공백
+            [('+00001234', '-00000005')] + [('        1', '        2')] * 4,  # 부호
+            [('   12 345', '        7')] + [('        1', '        2')] * 4,  # 중간 공백
+            [('  12a4567', '        7')] + [('        1', '        2')] * 4,  # 숫자 외 문자
+            [('         ', '         ')] * 5,                                  # 빈 칸
+        ]
+        lines = [make_line(ISIN_A, f'1000{i:02d}000000', hoga)
+                 for i, hoga in enumerate(hoga_cases)]
+        self.assert_same_as_parse_line(('\n'.join(lines) + '\n').encode())
+
+    def test_duty_window_and_bad_time(self):
+        # '0905 0000000'은 int(' 0')이 되어 문자열 파싱에서도 09:05:00으로 읽힘
+        times = ['085959999999', '090500000000', '120000000000', '152000000000',
+                 '152000000001', '1a0000000000', '0905 0000000']
+        lines = [make_line(ISIN_A, t) for t in times]
+        actual = self.assert_same_as_parse_line(('\n'.join(lines) + '\n').encode())
+        self.assertEqual(actual[ISIN_A]['time_sec'].tolist(),
+                         [mm.DUTY_START_SEC, mm.DUTY_START_SEC, 12 * 3600, mm.DUTY_END_SEC])
+
+    def test_out_of_order_and_other_isins(self):
+        lines = [
+            make_line(ISIN_A, '110000000000', [(f'{1:9d}', f'{1:9d}')] * 5),
+            make_line(ISIN_OTHER, '100000000000'),
+            make_line(ISIN_A, '100000000000', [(f'{2:9d}', f'{2:9d}')] * 5),
+            make_line(ISIN_B, '100000000000'),
+            make_line(ISIN_A, '110000000000', [(f'{3:9d}', f'{3:9d}')] * 5),  # 같은 시각은 파일 순서
+            make_line(ISIN_A, '100000000000', [(f'{4:9d}', f'{4:9d}')] * 5),
+        ]
+        actual = self.assert_same_as_parse_line(('\n'.join(lines) + '\n').encode())
+        self.assertEqual(actual[ISIN_A]['ask'].tolist(), [10, 20, 5, 15])
+
+    def test_no_target_isins(self):
+        data = (make_line(ISIN_A, '100000000000') + '\n').encode()
+        self.assertEqual(self.assert_same_as_parse_line(data, set()), {})
+
+
+if __name__ == '__main__':
+    unittest.main()